@@ -5,3 +5,7 @@ class ApiConfig(AppConfig):
     """Класс конфигурации приложения 'api' в Django."""
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        """Подключает обработчики сигналов приложения."""
+        from . import signals  # noqa: F401
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import uuid
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework.response import Response
+
+RESPONSE_CACHE_TIMEOUT = 60 * 60 * 24
+LOCAL_RESPONSE_CACHE_TIMEOUT = 300
+RESPONSE_CACHE_MAX_AGE = 60
+
+
+def get_cache_version(prefix):
+    """Возвращает текущую версию кэша ответов с указанным префиксом."""
+    return cache.get_or_set(f'{prefix}:version', uuid.uuid4().hex, None)
+
+
+def invalidate_cache(prefix):
+    """
+    Сбрасывает все закэшированные ответы с указанным префиксом,
+    меняя версию, входящую в ключи кэша. Внутри транзакции версия
+    меняется после ее фиксации, чтобы в кэш не попали
+    незафиксированные данные.
+    """
+    transaction.on_commit(
+        lambda: cache.set(f'{prefix}:version', uuid.uuid4().hex, None)
+    )
+
+
+def is_shared_cache():
+    """
+    Проверяет, общий ли кэш у всех процессов приложения.
+    Кэш в памяти процесса (LocMemCache) у каждого процесса свой,
+    и смена версии в invalidate_cache не видна другим процессам.
+    """
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def get_response_cache_timeout():
+    """
+    Возвращает время жизни закэшированных ответов: в кэше
+    в памяти процесса — не дольше LOCAL_RESPONSE_CACHE_TIMEOUT
+    секунд, в общем кэше (Redis, Memcached, файлы) —
+    RESPONSE_CACHE_TIMEOUT.
+    """
+    if not is_shared_cache():
+        return LOCAL_RESPONSE_CACHE_TIMEOUT
+    return RESPONSE_CACHE_TIMEOUT
+
+
+def get_cached_data(prefix, request, get_data):
+    """
+    Возвращает данные ответа из кэша или вычисляет их функцией get_data.
+
+    Ключ кэша строится из префикса, версии кэша, формата ответа
+    и полного адреса запроса: схемы, хоста, пути и параметров,
+    так как абсолютные ссылки в ответе зависят от схемы и хоста.
+    """
+    key = ':'.join((
+        prefix,
+        get_cache_version(prefix),
+        request.accepted_renderer.format,
+        request.build_absolute_uri()
+    ))
+    data = cache.get(key)
+    if data is None:
+        data = get_data()
+        cache.set(key, data, get_response_cache_timeout())
+    return data
+
+
+class CachedResponseMixin:
+    """
+    Миксин, кэширующий ответы действий list и retrieve.
+
+    Ключ кэша строится функцией get_cached_data. Ответ содержит сильный ETag
+    и заголовок Cache-Control, а запрос с совпадающим If-None-Match
+    получает ответ 304.
+    """
+    cache_prefix = None
+
+    def get_cached_response(self, request, get_data):
+        """Возвращает ответ с данными из кэша или из функции get_data."""
+
+        def get_data_with_etag():
+            data = get_data()
+            etag = hashlib.md5(
+                json.dumps(data, ensure_ascii=False, sort_keys=True).encode()
+            ).hexdigest()
+            return (f'"{etag}"', data)
+
+        etag, data = get_cached_data(
+            self.cache_prefix,
+            request,
+            get_data_with_etag
+        )
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response(data)
+        response['ETag'] = etag
+        patch_cache_control(
+            response,
+            public=True,
+            max_age=RESPONSE_CACHE_MAX_AGE
+        )
+        return response
+
+    def list(self, request, *args, **kwargs):
+        """Возвращает список объектов из кэша."""
+        return self.get_cached_response(
+            request,
+            lambda: super(CachedResponseMixin, self).list(
+                request, *args, **kwargs
+            ).data
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """Возвращает объект из кэша."""
+        return self.get_cached_response(
+            request,
+            lambda: super(CachedResponseMixin, self).retrieve(
+                request, *args, **kwargs
+            ).data
+        )
@@ -0,0 +1,153 @@
+from django.conf import settings
+from django.db.models import Count
+
+from food.models import FeedItem, Recipe
+from users.models import Subscription
+
+FEED_BATCH_SIZE = 1000
+
+
+def get_heavy_followers():
+    """
+    Возвращает id пользователей, для которых лента материализуется:
+    подписанных не меньше чем на FEED_FANOUT_MIN_SUBSCRIPTIONS авторов.
+    """
+    return Subscription.objects.values('user').annotate(
+        subscriptions_count=Count('id')
+    ).filter(
+        subscriptions_count__gte=settings.FEED_FANOUT_MIN_SUBSCRIPTIONS
+    ).values('user')
+
+
+def is_heavy_follower(user_id):
+    """Проверяет, материализуется ли лента пользователя."""
+    threshold = settings.FEED_FANOUT_MIN_SUBSCRIPTIONS
+    return bool(threshold) and Subscription.objects.filter(
+        user=user_id
+    ).count() >= threshold
+
+
+def get_feed_items(user, queryset):
+    """
+    Возвращает записи материализованной ленты пользователя
+    для рецептов из queryset или None, если лента не материализована.
+
+    Записи листаются по индексу (user, pub_date, recipe) без
+    соединения с рецептами; если queryset отфильтрован (например,
+    по тегам), записи ограничиваются его рецептами. Лента
+    без записей (порог задан на существующей базе, и команда
+    rebuild_feed еще не выполнялась) считается не материализованной.
+    """
+    if not settings.FEED_FANOUT_MIN_SUBSCRIPTIONS:
+        return None
+    feed_items = FeedItem.objects.filter(user=user)
+    if not feed_items.exists():
+        return None
+    if queryset.query.has_filters():
+        feed_items = feed_items.filter(recipe__in=queryset.values('id'))
+    return feed_items.only('pub_date', 'recipe_id')
+
+
+def get_feed_recipes(feed_items, queryset):
+    """
+    Возвращает рецепты из queryset для страницы записей ленты
+    feed_items в порядке записей.
+    """
+    recipes = queryset.in_bulk([item.recipe_id for item in feed_items])
+    return [
+        recipes[item.recipe_id]
+        for item in feed_items
+        if item.recipe_id in recipes
+    ]
+
+
+def get_feed_queryset(user, queryset):
+    """
+    Оставляет в queryset рецептов только рецепты авторов,
+    на которых подписан пользователь. Рецепты выбираются
+    по подпискам через индекс (author, pub_date); так строится
+    лента пользователей без материализованной ленты.
+    """
+    return queryset.filter(
+        author__in=Subscription.objects.filter(
+            user=user
+        ).values('author_id')
+    )
+
+
+def add_feed_items(user_id, recipes):
+    """Добавляет рецепты в материализованную ленту пользователя."""
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+            for recipe_id, pub_date in recipes.values_list('id', 'pub_date')
+        ),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def fill_feed(user_id):
+    """
+    Заполняет материализованную ленту пользователя рецептами
+    всех авторов, на которых он подписан.
+    """
+    add_feed_items(
+        user_id,
+        Recipe.objects.filter(
+            author__in=Subscription.objects.filter(
+                user=user_id
+            ).values('author_id')
+        )
+    )
+
+
+def fan_out_recipe(recipe):
+    """Добавляет новый рецепт в материализованные ленты подписчиков автора."""
+    if not settings.FEED_FANOUT_MIN_SUBSCRIPTIONS:
+        return
+    followers = Subscription.objects.filter(
+        author=recipe.author_id,
+        user__in=get_heavy_followers()
+    ).values_list('user_id', flat=True)
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(user_id=user_id, recipe=recipe, pub_date=recipe.pub_date)
+            for user_id in followers.iterator()
+        ),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def add_subscription_to_feed(subscription):
+    """
+    Обновляет материализованную ленту после подписки. Если число
+    подписок не меньше порога, а лента еще пуста, она заполняется
+    рецептами всех авторов, иначе добавляются только рецепты
+    нового автора.
+    """
+    if not is_heavy_follower(subscription.user_id):
+        return
+    if FeedItem.objects.filter(user=subscription.user_id).exists():
+        add_feed_items(
+            subscription.user_id,
+            Recipe.objects.filter(author=subscription.author_id)
+        )
+    else:
+        fill_feed(subscription.user_id)
+
+
+def remove_subscription_from_feed(subscription):
+    """
+    Обновляет материализованную ленту после отписки. Если число
+    подписок стало меньше порога, лента пользователя удаляется.
+    """
+    threshold = settings.FEED_FANOUT_MIN_SUBSCRIPTIONS
+    if not threshold:
+        return
+    feed_items = FeedItem.objects.filter(user=subscription.user_id)
+    if not is_heavy_follower(subscription.user_id):
+        feed_items.delete()
+    else:
+        feed_items.filter(recipe__author=subscription.author_id).delete()
@@ -1,7 +1,44 @@
+from django import forms
+from django.db.models import Case, Exists, IntegerField, OuterRef, Value, When
 from django_filters.rest_framework import FilterSet, filters
+from rest_framework.filters import OrderingFilter
 
-from food.models import Recipe, Tag
+from food.models import Ingredient, Recipe, normalize_name
 from users.models import User
+from .search import tag_index
+
+
+INGREDIENT_SEARCH_LIMIT = 50
+
+
+class IngredientFilter(FilterSet):
+    """Поиск ингредиентов по названию."""
+    name = filters.CharFilter(
+        method='get_name'
+    )
+
+    class Meta:
+        model = Ingredient
+        fields = ('name',)
+
+    def get_name(self, queryset, name, value):
+        """
+        Возвращает ингредиенты, в названии которых встречается value,
+        без учета регистра. Сначала идут ингредиенты, название которых
+        начинается с value, затем остальные совпадения.
+        Поиск идет по нормализованному полю search_name с индексом
+        (и триграммным индексом в PostgreSQL).
+        """
+        value = normalize_name(value)
+        return queryset.filter(
+            search_name__contains=value
+        ).annotate(
+            rank=Case(
+                When(search_name__startswith=value, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField()
+            )
+        ).order_by('rank', 'name')[:INGREDIENT_SEARCH_LIMIT]
 
 
 class RecipeFilter(FilterSet):
@@ -12,10 +49,9 @@ class RecipeFilter(FilterSet):
         queryset=User.objects.all()
     )
 
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all()
+    tags = filters.Filter(
+        method='get_tags',
+        widget=forms.SelectMultiple
     )
 
     is_favorited = filters.BooleanFilter(
@@ -35,6 +71,28 @@ class RecipeFilter(FilterSet):
             'is_in_shopping_cart'
         )
 
+    def get_tags(self, queryset, name, value):
+        """
+        Фильтрует queryset, чтобы включать только рецепты
+        хотя бы с одним из тегов с переданными slug.
+
+        Slug переводятся в id по индексу тегов в памяти, а рецепты
+        отбираются условием EXISTS по таблице связи рецептов и тегов.
+        В отличие от соединения с тегами, рецепт с несколькими
+        подходящими тегами не повторяется и DISTINCT не нужен.
+        """
+        tag_ids = tag_index.get_ids(value)
+        if not tag_ids:
+            return queryset.none()
+        return queryset.filter(
+            Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe=OuterRef('pk'),
+                    tag__in=tag_ids
+                )
+            )
+        )
+
     def get_is_favorited(self, queryset, name, value):
         """
         Фильтрует queryset, чтобы включать только объекты,
@@ -56,3 +114,18 @@ class RecipeFilter(FilterSet):
                 cart__user=self.request.user.id
             )
         return queryset
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    """
+    Сортировка рецептов по параметру ordering, например
+    ordering=-favorites_count. Рецепты с равными значениями
+    дополнительно сортируются по id, чтобы страницы не пересекались.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        """Возвращает сортировку с id в качестве последнего ключа."""
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering:
+            return (*ordering, '-id')
+        return ordering
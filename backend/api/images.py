@@ -0,0 +1,202 @@
+import binascii
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.db import connection
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from food.models import Recipe
+from users.models import User
+
+from .caching import invalidate_cache
+
+logger = logging.getLogger(__name__)
+
+IMAGE_VARIANTS = {
+    'thumbnail': (320, 320),
+    'medium': (960, 960),
+}
+IMAGE_VARIANT_FORMAT = 'webp'
+IMAGE_VARIANT_QUALITY = 80
+
+IMAGE_CONTENT_TYPES = {
+    'image/png': 'png',
+    'image/jpeg': 'jpg',
+    'image/jpg': 'jpg',
+    'image/webp': 'webp',
+    'image/gif': 'gif',
+}
+BASE64_MARKER = ';base64,'
+BASE64_HEADER_MAX_LENGTH = 64
+BASE64_CHUNK_SIZE = 64 * 1024
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def is_base64_image(data):
+    """Проверяет, является ли data строкой data:<тип>;base64,<данные>."""
+    return (
+        isinstance(data, str)
+        and data.startswith('data:')
+        and data.find(BASE64_MARKER, 0, BASE64_HEADER_MAX_LENGTH) != -1
+    )
+
+
+def decode_base64_image(data, max_size):
+    """
+    Декодирует изображение из строки data:<тип>;base64,<данные>
+    во временный файл.
+
+    Размер изображения проверяется по длине строки до декодирования.
+    Строка декодируется частями по BASE64_CHUNK_SIZE символов, и каждая
+    часть сразу пишется в файл, поэтому в памяти не создаются ни копия
+    base64-данных, ни декодированное изображение целиком.
+    """
+    marker = data.find(BASE64_MARKER, 0, BASE64_HEADER_MAX_LENGTH)
+    content_type = data[len('data:'):marker].lower()
+    extension = IMAGE_CONTENT_TYPES.get(content_type)
+    if extension is None:
+        raise ValidationError(
+            'Поддерживаются изображения PNG, JPEG, WebP и GIF.'
+        )
+    start = marker + len(BASE64_MARKER)
+    padding = 2 if data.endswith('==') else int(data.endswith('='))
+    if (len(data) - start) // 4 * 3 - padding > max_size:
+        raise ValidationError(
+            f'Размер изображения не должен превышать {max_size} байт.'
+        )
+    file = TemporaryUploadedFile(
+        f'image.{extension}', content_type, 0, None
+    )
+    try:
+        carry = ''
+        for position in range(start, len(data), BASE64_CHUNK_SIZE):
+            chunk = carry + ''.join(
+                data[position:position + BASE64_CHUNK_SIZE].split()
+            )
+            end = len(chunk) - len(chunk) % 4
+            carry = chunk[end:]
+            file.write(binascii.a2b_base64(chunk[:end]))
+        if carry:
+            raise binascii.Error('Incorrect padding')
+    except binascii.Error:
+        file.close()
+        raise ValidationError('Некорректные данные изображения в base64.')
+    file.size = file.tell()
+    file.seek(0)
+    return file
+
+
+def get_variant_name(name, variant):
+    """Возвращает имя файла уменьшенной копии изображения name."""
+    return f'{os.path.splitext(name)[0]}_{variant}.{IMAGE_VARIANT_FORMAT}'
+
+
+def get_variant_urls(name, variants_ready):
+    """
+    Возвращает ссылки на уменьшенные копии изображения name.
+    Пока копии не созданы (variants_ready ложно), вместо них
+    отдаются ссылки на оригинал. Хранилище не опрашивается.
+    """
+    if not variants_ready:
+        original_url = default_storage.url(name)
+        return {variant: original_url for variant in IMAGE_VARIANTS}
+    return {
+        variant: default_storage.url(get_variant_name(name, variant))
+        for variant in IMAGE_VARIANTS
+    }
+
+
+def generate_image_variants(name):
+    """
+    Создает уменьшенные копии изображения name в формате WebP.
+    Уже существующие копии не пересоздаются. Возвращает число
+    созданных копий.
+    """
+    missing = {
+        variant: size for variant, size in IMAGE_VARIANTS.items()
+        if not default_storage.exists(get_variant_name(name, variant))
+    }
+    if not missing:
+        return 0
+    with default_storage.open(name) as file:
+        image = Image.open(file)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert(
+            'RGBA'
+            if 'A' in image.getbands() or 'transparency' in image.info
+            else 'RGB'
+        )
+    save = getattr(default_storage, 'save_as', default_storage.save)
+    for variant, size in missing.items():
+        resized = image.copy()
+        resized.thumbnail(size)
+        buffer = BytesIO()
+        resized.save(
+            buffer,
+            IMAGE_VARIANT_FORMAT,
+            quality=IMAGE_VARIANT_QUALITY
+        )
+        save(get_variant_name(name, variant), ContentFile(buffer.getvalue()))
+    return len(missing)
+
+
+def mark_image_variants_ready(name):
+    """
+    Отмечает, что копии изображения name созданы, у рецептов
+    и пользователей с этим изображением. Возвращает число
+    обновленных записей.
+    """
+    return (
+        Recipe.objects.filter(image=name).exclude(
+            image_variants_source=name
+        ).update(image_variants_source=name)
+        + User.objects.filter(avatar=name).exclude(
+            avatar_variants_source=name
+        ).update(avatar_variants_source=name)
+    )
+
+
+def process_image_variants(name):
+    """
+    Создает копии изображения в пуле потоков, отмечает их
+    готовность и сбрасывает кэш списка рецептов, чтобы в нем
+    появились ссылки на копии.
+    """
+    try:
+        generate_image_variants(name)
+        if mark_image_variants_ready(name):
+            invalidate_cache('recipes')
+    except Exception:
+        logger.exception('Не удалось создать копии изображения %s', name)
+    finally:
+        connection.close()
+
+
+def get_executor():
+    """Возвращает пул потоков для обработки изображений."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.IMAGE_WORKERS,
+                    thread_name_prefix='images'
+                )
+    return _executor
+
+
+def schedule_image_variants(name):
+    """Ставит создание копий изображения name в очередь пула потоков."""
+    if name:
+        get_executor().submit(process_image_variants, name)
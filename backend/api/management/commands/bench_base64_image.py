@@ -0,0 +1,87 @@
+import base64
+import time
+import tracemalloc
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+
+from api.images import decode_base64_image
+
+PROC_STATUS = '/proc/self/status'
+PROC_CLEAR_REFS = '/proc/self/clear_refs'
+
+
+def decode_whole(data, max_size):
+    """Прежний способ: разбиение строки и декодирование целиком."""
+    format, imgstr = data.split(';base64,')
+    ext = format.split('/')[-1]
+    return ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+
+
+def read_memory_status():
+    """Возвращает текущий и пиковый RSS процесса в байтах (только Linux)."""
+    values = {}
+    with open(PROC_STATUS) as status:
+        for line in status:
+            key, _, value = line.partition(':')
+            if key in ('VmRSS', 'VmHWM'):
+                values[key] = int(value.split()[0]) * 1024
+    return values['VmRSS'], values['VmHWM']
+
+
+def reset_peak_rss():
+    """Сбрасывает пиковый RSS процесса; возвращает False, если нельзя."""
+    try:
+        with open(PROC_CLEAR_REFS, 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        return False
+    return True
+
+
+class Command(BaseCommand):
+    """
+    Сравнивает декодирование изображения из base64 целиком
+    и частями во временный файл (decode_base64_image): время,
+    пик памяти Python (tracemalloc) и прирост пикового RSS процесса.
+    """
+    help = 'Нагрузочная проверка декодирования изображений из base64'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size',
+            type=int,
+            default=7,
+            help='Размер декодированного изображения, МБ'
+        )
+
+    def measure(self, label, decode, data):
+        """Выводит время и пиковую память декодирования data."""
+        rss_supported = reset_peak_rss()
+        rss_before = read_memory_status()[0] if rss_supported else 0
+        tracemalloc.start()
+        started = time.perf_counter()
+        file = decode(data, len(data))
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        rss = (
+            f'{(read_memory_status()[1] - rss_before) / 2 ** 20:.1f} МБ'
+            if rss_supported else 'нет данных'
+        )
+        self.stdout.write(
+            f'{label}: {elapsed * 1000:.0f} мс, '
+            f'пик памяти Python: {peak / 2 ** 20:.1f} МБ, '
+            f'прирост пикового RSS: {rss}'
+        )
+        file.close()
+
+    def handle(self, *args, **options):
+        size = options['size'] * 2 ** 20
+        data = 'data:image/png;base64,' + 'iVBO' * (size // 3)
+        self.stdout.write(
+            f'Строка base64: {len(data) / 2 ** 20:.1f} МБ, '
+            f'изображение: {options["size"]} МБ'
+        )
+        self.measure('Целиком', decode_whole, data)
+        self.measure('Частями во временный файл', decode_base64_image, data)
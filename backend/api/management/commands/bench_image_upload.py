@@ -0,0 +1,102 @@
+import base64
+import io
+import math
+import os
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from PIL import Image
+from rest_framework.parsers import JSONParser, MultiPartParser
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.parsers import ImageUploadParser, get_image_data
+from api.serializers import AvatarSerializer
+
+from .bench_base64_image import read_memory_status, reset_peak_rss
+
+BENCH_PATH = '/api/users/me/avatar/'
+
+
+def make_png(size):
+    """Возвращает PNG из случайных пикселей размером около size байт."""
+    side = int(math.sqrt(size / 3))
+    image = Image.frombytes('RGB', (side, side), os.urandom(side * side * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG', compress_level=1)
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    """
+    Сравнивает загрузку аватара в JSON (base64), в multipart/form-data
+    и телом запроса (Content-Type: image/png): время разбора запроса
+    и проверки изображения, пик памяти Python (tracemalloc) и прирост
+    пикового RSS процесса. Тела запросов собираются заранее и в
+    измерение не входят.
+    """
+    help = 'Нагрузочная проверка способов загрузки изображений'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size',
+            type=int,
+            default=7,
+            help='Примерный размер изображения, МБ'
+        )
+
+    def measure(self, label, wsgi_request):
+        """Выводит время и пиковую память разбора и проверки запроса."""
+        rss_supported = reset_peak_rss()
+        rss_before = read_memory_status()[0] if rss_supported else 0
+        tracemalloc.start()
+        started = time.perf_counter()
+        request = Request(
+            wsgi_request,
+            parsers=(JSONParser(), MultiPartParser(), ImageUploadParser())
+        )
+        serializer = AvatarSerializer(
+            data=get_image_data(request, 'avatar')
+        )
+        serializer.is_valid(raise_exception=True)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        rss = (
+            f'{(read_memory_status()[1] - rss_before) / 2 ** 20:.1f} МБ'
+            if rss_supported else 'нет данных'
+        )
+        self.stdout.write(
+            f'{label}: {elapsed * 1000:.0f} мс, '
+            f'пик памяти Python: {peak / 2 ** 20:.1f} МБ, '
+            f'прирост пикового RSS: {rss}'
+        )
+        serializer.validated_data['avatar'].close()
+
+    def handle(self, *args, **options):
+        image = make_png(options['size'] * 2 ** 20)
+        self.stdout.write(f'Изображение: {len(image) / 2 ** 20:.1f} МБ')
+        factory = APIRequestFactory()
+        encoded = base64.b64encode(image).decode()
+        json_request = factory.put(
+            BENCH_PATH,
+            {'avatar': f'data:image/png;base64,{encoded}'},
+            format='json'
+        )
+        del encoded
+        file = io.BytesIO(image)
+        file.name = 'avatar.png'
+        multipart_request = factory.put(
+            BENCH_PATH,
+            {'avatar': file},
+            format='multipart'
+        )
+        raw_request = factory.put(
+            BENCH_PATH,
+            image,
+            content_type='image/png'
+        )
+        self.measure('JSON (base64)', json_request)
+        self.measure('multipart/form-data', multipart_request)
+        self.measure('Тело запроса image/png', raw_request)
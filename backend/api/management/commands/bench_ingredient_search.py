@@ -0,0 +1,57 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.filters import INGREDIENT_SEARCH_LIMIT, IngredientFilter
+from api.search import ingredient_index
+from food.models import Ingredient
+
+
+class Command(BaseCommand):
+    """Сравнивает скорость поиска ингредиентов по индексу и через ORM."""
+    help = 'Сравнивает поиск ингредиентов по индексу в памяти и через ORM'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=500,
+            help='Количество поисковых запросов'
+        )
+
+    def handle(self, *args, **options):
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            self.stderr.write('Таблица ингредиентов пуста')
+            return
+        random.seed(0)
+        queries = []
+        for _ in range(options['queries']):
+            name = random.choice(names)
+            queries.append(name[:random.randint(1, min(len(name), 5))])
+
+        ingredient_index.invalidate()
+        started = time.perf_counter()
+        ingredient_index.search(queries[0], INGREDIENT_SEARCH_LIMIT)
+        build_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for query in queries:
+            ingredient_index.search(query, INGREDIENT_SEARCH_LIMIT)
+        index_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for query in queries:
+            list(IngredientFilter(
+                {'name': query},
+                queryset=Ingredient.objects.all()
+            ).qs)
+        orm_time = time.perf_counter() - started
+
+        self.stdout.write(
+            f'Ингредиентов: {len(names)}, запросов: {len(queries)}\n'
+            f'Построение индекса: {build_time * 1000:.2f} мс\n'
+            f'Индекс: {index_time / len(queries) * 1000:.3f} мс на запрос\n'
+            f'ORM: {orm_time / len(queries) * 1000:.3f} мс на запрос'
+        )
@@ -0,0 +1,106 @@
+import time
+from itertools import cycle
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api.serializers import RecipeCreateSerializer
+from food.models import Ingredient, Recipe, RecipeIngredient
+from users.models import User
+
+BENCH_PREFIX = 'bench_recipe_update_'
+
+
+def replace_ingredients(recipe, ingredients):
+    """Прежний способ: удаление и повторное создание всех ингредиентов."""
+    RecipeIngredient.objects.filter(recipe=recipe).delete()
+    RecipeCreateSerializer().create_ingredients(recipe, ingredients)
+
+
+class Command(BaseCommand):
+    """
+    Нагрузочная проверка изменения ингредиентов рецепта: пересоздание
+    всех записей RecipeIngredient против изменения по разнице
+    (RecipeCreateSerializer.update_ingredients) для типичных правок.
+    Все данные создаются в транзакции, которая откатывается в конце.
+    """
+    help = 'Нагрузочная проверка изменения ингредиентов рецепта'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            default=60,
+            help='Количество ингредиентов в рецепте'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='Количество повторов каждого измерения'
+        )
+
+    def measure(self, label, func, repeat):
+        """Выводит среднее время выполнения func и число ее запросов."""
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        elapsed = (time.perf_counter() - started) / repeat
+        self.stdout.write(
+            f'{label}: {elapsed * 1000:.2f} мс, '
+            f'запросов: {len(queries.captured_queries)}'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options['ingredients'], options['repeat'])
+            transaction.set_rollback(True)
+
+    def run(self, ingredients_count, repeat):
+        author = User.objects.create(
+            username=f'{BENCH_PREFIX}author',
+            email=f'{BENCH_PREFIX}author@example.com'
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'{BENCH_PREFIX}{number}', measurement_unit='г')
+            for number in range(ingredients_count + 1)
+        )
+        ingredients = list(Ingredient.objects.filter(
+            name__startswith=BENCH_PREFIX
+        ).order_by('id'))
+        recipe = Recipe.objects.create(
+            author=author,
+            name='Рецепт',
+            text='Описание',
+            cooking_time=1
+        )
+        base = [
+            {'id': ingredient, 'amount': 100}
+            for ingredient in ingredients[:ingredients_count]
+        ]
+        changed_amount = [{**base[0], 'amount': 200}, *base[1:]]
+        added = [*base, {'id': ingredients[-1], 'amount': 100}]
+        removed = base[:-1]
+        self.stdout.write(f'Ингредиентов в рецепте: {ingredients_count}')
+
+        serializer = RecipeCreateSerializer()
+        for label, variant in (
+            ('Без изменений', base),
+            ('Изменено одно количество', changed_amount),
+            ('Добавлен один ингредиент', added),
+            ('Удален один ингредиент', removed),
+        ):
+            for method, update in (
+                ('пересоздание', replace_ingredients),
+                ('по разнице', serializer.update_ingredients),
+            ):
+                replace_ingredients(recipe, base)
+                variants = cycle((variant, base))
+                self.measure(
+                    f'{label}, {method}',
+                    lambda: update(recipe, next(variants)),
+                    repeat
+                )
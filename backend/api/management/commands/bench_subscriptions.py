@@ -0,0 +1,185 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.feed import (
+    add_subscription_to_feed,
+    get_feed_items,
+    get_feed_queryset,
+    get_feed_recipes
+)
+from api.views import RecipeViewSet, UserViewSet
+from food.models import FeedItem, Recipe
+from users.models import Subscription, User
+
+BENCH_PREFIX = 'bench_subscriptions_'
+
+
+class Command(BaseCommand):
+    """
+    Нагрузочная проверка подписок и ленты: пользователь подписывается
+    на authors авторов, после чего измеряются список подписок и лента
+    при сборке на чтение и при материализации на запись.
+    Все данные создаются в транзакции, которая откатывается в конце.
+    """
+    help = 'Нагрузочная проверка подписок и ленты рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--authors',
+            type=int,
+            default=10000,
+            help='Количество авторов, на которых подписан пользователь'
+        )
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=3,
+            help='Количество рецептов у каждого автора'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Количество повторов каждого измерения'
+        )
+
+    def measure(self, label, func, repeat):
+        """Выводит среднее время выполнения func и число ее запросов."""
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        elapsed = (time.perf_counter() - started) / repeat
+        self.stdout.write(
+            f'{label}: {elapsed * 1000:.2f} мс, '
+            f'запросов: {len(queries.captured_queries)}'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options['authors'], options['recipes'], options['repeat'])
+            transaction.set_rollback(True)
+
+    def run(self, authors_count, recipes_count, repeat):
+        started = time.perf_counter()
+        follower = User.objects.create(
+            username=f'{BENCH_PREFIX}follower',
+            email=f'{BENCH_PREFIX}follower@example.com'
+        )
+        User.objects.bulk_create(
+            User(
+                username=f'{BENCH_PREFIX}{number}',
+                email=f'{BENCH_PREFIX}{number}@example.com'
+            )
+            for number in range(authors_count)
+        )
+        authors = list(User.objects.filter(
+            username__startswith=BENCH_PREFIX
+        ).exclude(pk=follower.pk).values_list('pk', flat=True))
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    author_id=author_id,
+                    name=f'Рецепт {number}',
+                    text='Описание',
+                    cooking_time=1
+                )
+                for author_id in authors
+                for number in range(recipes_count)
+            ),
+            batch_size=5000
+        )
+        subscribe_started = time.perf_counter()
+        Subscription.objects.bulk_create(
+            (Subscription(user=follower, author_id=author_id)
+             for author_id in authors),
+            batch_size=5000
+        )
+        self.stdout.write(
+            f'Данные: {len(authors)} авторов, '
+            f'{len(authors) * recipes_count} рецептов, '
+            f'{time.perf_counter() - started:.2f} с; '
+            f'подписки: {time.perf_counter() - subscribe_started:.2f} с'
+        )
+
+        factory = APIRequestFactory()
+        subscriptions_view = UserViewSet.as_view({'get': 'subscriptions'})
+        feed_view = RecipeViewSet.as_view({'get': 'feed'})
+
+        def get(view, path):
+            request = factory.get(path, HTTP_HOST='localhost')
+            force_authenticate(request, user=follower)
+            response = view(request)
+            response.render()
+            return response
+
+        self.measure(
+            'Список подписок (limit=6, recipes_limit=3)',
+            lambda: get(
+                subscriptions_view,
+                '/api/users/subscriptions/?limit=6&recipes_limit=3'
+            ),
+            repeat
+        )
+        self.measure(
+            'Лента, сборка на чтение (SQL)',
+            lambda: list(get_feed_queryset(
+                follower, Recipe.objects.all()
+            ).order_by('-pub_date', '-id')[:10]),
+            repeat
+        )
+        self.measure(
+            'Лента, сборка на чтение (API)',
+            lambda: get(feed_view, '/api/recipes/feed/?limit=10'),
+            repeat
+        )
+
+        with override_settings(FEED_FANOUT_MIN_SUBSCRIPTIONS=authors_count):
+            started = time.perf_counter()
+            add_subscription_to_feed(
+                Subscription.objects.filter(user=follower).first()
+            )
+            self.stdout.write(
+                f'Материализация ленты: {FeedItem.objects.count()} записей, '
+                f'{time.perf_counter() - started:.2f} с'
+            )
+            self.measure(
+                'Лента, материализованная (SQL)',
+                lambda: get_feed_recipes(
+                    get_feed_items(
+                        follower, Recipe.objects.all()
+                    ).order_by('-pub_date', '-recipe_id')[:10],
+                    Recipe.objects.all()
+                ),
+                repeat
+            )
+            self.measure(
+                'Лента, материализованная (API)',
+                lambda: get(feed_view, '/api/recipes/feed/?limit=10'),
+                repeat
+            )
+            self.measure(
+                'Публикация рецепта с рассылкой в ленты',
+                lambda: Recipe.objects.create(
+                    author_id=authors[0],
+                    name='Новый рецепт',
+                    text='Описание',
+                    cooking_time=1
+                ),
+                repeat
+            )
+        self.measure(
+            'Публикация рецепта без рассылки',
+            lambda: Recipe.objects.create(
+                author_id=authors[0],
+                name='Новый рецепт',
+                text='Описание',
+                cooking_time=1
+            ),
+            repeat
+        )
@@ -0,0 +1,109 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.feed import get_feed_queryset
+from api.utils import get_shopping_list_items
+from api.views import RecipeViewSet
+from food.models import (
+    FeedItem, Recipe, RecipeIngredient, ShoppingCart, Tag
+)
+from users.models import User
+
+PAGE_SIZE = 6
+
+
+class Command(BaseCommand):
+    """
+    Выводит планы выполнения (EXPLAIN) самых частых запросов API,
+    чтобы проверить, что они используют индексы. Запросы строятся
+    теми же вьюсетами и функциями, что и в API, от имени пользователя
+    с переданным id (по умолчанию — первого пользователя).
+    """
+    help = 'Планы выполнения частых запросов API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            help='id пользователя, от имени которого строятся запросы'
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Выполнить запросы (EXPLAIN ANALYZE, только PostgreSQL)'
+        )
+
+    def get_recipes(self, user, params):
+        """Возвращает queryset списка рецептов с фильтрами params."""
+        request = Request(APIRequestFactory().get('/api/recipes/', params))
+        request.user = user
+        view = RecipeViewSet(
+            request=request, action='list', format_kwarg=None, kwargs={}
+        )
+        return view.filter_queryset(view.get_queryset())
+
+    def get_queries(self, user):
+        """Возвращает пары (название, queryset) проверяемых запросов."""
+        page = list(
+            Recipe.objects.values_list('id', flat=True)[:PAGE_SIZE]
+        ) or [0]
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        return (
+            (
+                'Страница рецептов',
+                self.get_recipes(user, {})[:PAGE_SIZE]
+            ),
+            (
+                'Рецепты с тегами (tags=...&tags=...)',
+                self.get_recipes(user, {'tags': tags})[:PAGE_SIZE]
+            ),
+            (
+                'Рецепты в избранном (is_favorited=1)',
+                self.get_recipes(user, {'is_favorited': 1})[:PAGE_SIZE]
+            ),
+            (
+                'Рецепты в списке покупок (is_in_shopping_cart=1)',
+                self.get_recipes(
+                    user, {'is_in_shopping_cart': 1}
+                )[:PAGE_SIZE]
+            ),
+            (
+                'Ингредиенты рецептов страницы',
+                RecipeIngredient.objects.select_related(
+                    'ingredient'
+                ).filter(recipe__in=page)
+            ),
+            (
+                'Список покупок',
+                get_shopping_list_items(
+                    ShoppingCart.objects.filter(user=user)
+                )
+            ),
+            (
+                'Лента подписок',
+                get_feed_queryset(
+                    user, Recipe.objects.all()
+                ).order_by('-pub_date', '-id')[:PAGE_SIZE]
+            ),
+            (
+                'Материализованная лента подписок',
+                FeedItem.objects.filter(user=user).order_by(
+                    '-pub_date', '-recipe_id'
+                )[:PAGE_SIZE]
+            ),
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['user'] is not None:
+            users = users.filter(id=options['user'])
+        user = users.first()
+        if user is None:
+            raise CommandError('Пользователь не найден')
+        explain_options = {'analyze': True} if options['analyze'] else {}
+        for title, queryset in self.get_queries(user):
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write('')
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from api.caching import invalidate_cache
+from api.images import generate_image_variants, mark_image_variants_ready
+from food.models import Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    """
+    Создает недостающие уменьшенные копии изображений рецептов
+    и аватаров пользователей, например для изображений,
+    загруженных до появления копий, и отмечает их готовность
+    в записях рецептов и пользователей.
+    """
+    help = 'Создает уменьшенные копии изображений рецептов и аватаров'
+
+    def handle(self, *args, **options):
+        names = set(
+            Recipe.objects.exclude(image='').exclude(
+                image__isnull=True
+            ).values_list('image', flat=True)
+        ) | set(
+            User.objects.exclude(avatar='').exclude(
+                avatar__isnull=True
+            ).values_list('avatar', flat=True)
+        )
+        created = failed = marked = 0
+        for name in sorted(names):
+            try:
+                created += generate_image_variants(name)
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+            else:
+                marked += mark_image_variants_ready(name)
+        if marked:
+            invalidate_cache('recipes')
+        self.stdout.write(
+            f'Изображений: {len(names)}, создано копий: {created}, '
+            f'ошибок: {failed}'
+        )
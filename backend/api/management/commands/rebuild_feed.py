@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.feed import fill_feed, get_heavy_followers
+from food.models import FeedItem
+from users.models import Subscription
+
+
+class Command(BaseCommand):
+    """
+    Приводит материализованные ленты в соответствие с порогом
+    FEED_FANOUT_MIN_SUBSCRIPTIONS: заполняет ленты пользователей,
+    подписанных не меньше чем на порог авторов, и удаляет ленты
+    остальных. Выполняется после включения или изменения порога.
+    """
+    help = 'Перестраивает материализованные ленты подписок'
+
+    def handle(self, *args, **options):
+        if not settings.FEED_FANOUT_MIN_SUBSCRIPTIONS:
+            deleted, _ = FeedItem.objects.all().delete()
+            self.stdout.write(
+                f'Порог не задан, удалено записей лент: {deleted}'
+            )
+            return
+        heavy_followers = get_heavy_followers()
+        deleted, _ = FeedItem.objects.exclude(
+            user__in=heavy_followers
+        ).delete()
+        users = Subscription.objects.filter(
+            user__in=heavy_followers
+        ).values_list('user_id', flat=True).distinct()
+        filled = 0
+        for user_id in users.iterator():
+            fill_feed(user_id)
+            filled += 1
+        self.stdout.write(
+            f'Заполнено лент: {filled}, удалено записей лент: {deleted}'
+        )
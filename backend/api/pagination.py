@@ -0,0 +1,154 @@
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class RecipePagination(LimitOffsetPagination):
+    """
+    Пагинация списка рецептов.
+
+    По умолчанию работает как LimitOffsetPagination и дополнительно
+    понимает параметр page: при его наличии смещение считается
+    как (page - 1) * limit.
+
+    С параметром cursor включается постраничная навигация по ключу
+    (pub_date, id): следующая страница выбирается условием по ключу
+    последнего рецепта, а не через OFFSET, поэтому глубокие страницы
+    не дороже первой. Общее количество рецептов в этом режиме
+    считается только по запросу с параметром count=1. Поля ключа
+    задаются атрибутом cursor_fields, чтобы листать и записи,
+    ссылающиеся на рецепты (например, FeedItem).
+    """
+    page_query_param = 'page'
+    cursor_query_param = 'cursor'
+    cursor_by_default = False
+    cursor_fields = ('pub_date', 'id')
+    count_query_param = 'count'
+    invalid_cursor_message = 'Неверный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Возвращает рецепты текущей страницы."""
+        self.use_cursor = (
+            self.cursor_by_default
+            or self.cursor_query_param in request.query_params
+        )
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = queryset.count()
+
+        date_field, id_field = self.cursor_fields
+        reverse, position = self.decode_cursor(request)
+        if reverse:
+            queryset = queryset.order_by(date_field, id_field).filter(
+                Q(**{f'{date_field}__gt': position[0]})
+                | Q(**{
+                    date_field: position[0],
+                    f'{id_field}__gt': position[1]
+                })
+            )
+        else:
+            queryset = queryset.order_by(f'-{date_field}', f'-{id_field}')
+            if position:
+                queryset = queryset.filter(
+                    Q(**{f'{date_field}__lt': position[0]})
+                    | Q(**{
+                        date_field: position[0],
+                        f'{id_field}__lt': position[1]
+                    })
+                )
+        results = list(queryset[:self.limit + 1])
+        has_more = len(results) > self.limit
+        results = results[:self.limit]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.results = results
+        return results
+
+    def get_offset(self, request):
+        """Возвращает смещение с учетом параметра page."""
+        if (
+            self.offset_query_param not in request.query_params
+            and self.page_query_param in request.query_params
+        ):
+            try:
+                page = int(request.query_params[self.page_query_param])
+            except ValueError:
+                return 0
+            return max(page - 1, 0) * self.limit
+        return super().get_offset(request)
+
+    def decode_cursor(self, request):
+        """
+        Разбирает курсор вида 'направление|pub_date|id'.
+        Пустой курсор означает первую страницу.
+        """
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return False, None
+        try:
+            reverse, pub_date, pk = b64decode(
+                cursor.encode()
+            ).decode().split('|')
+            return reverse == 'r', (datetime.fromisoformat(pub_date), int(pk))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, recipe, reverse):
+        """Возвращает ссылку на страницу, соседнюю с рецептом recipe."""
+        date_field, id_field = self.cursor_fields
+        cursor = b64encode(
+            f'{"r" if reverse else "f"}|'
+            f'{getattr(recipe, date_field).isoformat()}|'
+            f'{getattr(recipe, id_field)}'.encode()
+        ).decode()
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.offset_query_param)
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        """Возвращает ссылку на следующую страницу."""
+        if not self.use_cursor:
+            return super().get_next_link()
+        if not self.has_next or not self.results:
+            return None
+        return self.encode_cursor(self.results[-1], reverse=False)
+
+    def get_previous_link(self):
+        """Возвращает ссылку на предыдущую страницу."""
+        if not self.use_cursor:
+            return super().get_previous_link()
+        if not self.has_previous or not self.results:
+            return None
+        return self.encode_cursor(self.results[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        """Возвращает ответ со ссылками на соседние страницы."""
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+        return Response(response)
+
+
+class RecipeFeedPagination(RecipePagination):
+    """Пагинация ленты подписок: всегда по ключу (pub_date, id)."""
+    cursor_by_default = True
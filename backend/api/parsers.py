@@ -0,0 +1,65 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import FileUploadParser
+
+from .images import IMAGE_CONTENT_TYPES
+
+UPLOAD_FIELD_NAME = 'file'
+
+
+class ImageUploadParser(FileUploadParser):
+    """
+    Парсер запроса, тело которого целиком является изображением
+    (например, PUT с заголовком Content-Type: image/png).
+
+    Тело запроса потоково передается обработчикам загрузки Django,
+    как и файлы из multipart/form-data: небольшие изображения остаются
+    в памяти, большие записываются во временный файл. Запросы с
+    Content-Length больше settings.MAX_IMAGE_SIZE отклоняются до чтения
+    тела. Файл доступен в request.data под ключом UPLOAD_FIELD_NAME.
+    """
+    media_type = 'image/*'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """Проверяет размер тела запроса и сохраняет его как файл."""
+        meta = parser_context['request'].META
+        try:
+            content_length = int(meta.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            content_length = 0
+        if content_length > settings.MAX_IMAGE_SIZE:
+            raise ParseError(
+                'Размер изображения не должен превышать '
+                f'{settings.MAX_IMAGE_SIZE} байт.'
+            )
+        return super().parse(stream, media_type, parser_context)
+
+    def get_filename(self, stream, media_type, parser_context):
+        """
+        Возвращает имя файла из заголовка Content-Disposition,
+        а без него — имя с расширением по типу изображения.
+        """
+        filename = super().get_filename(stream, media_type, parser_context)
+        if filename:
+            return filename
+        content_type = (media_type or '').split(';')[0].strip().lower()
+        extension = IMAGE_CONTENT_TYPES.get(content_type)
+        if extension is None:
+            raise ParseError(
+                'Поддерживаются изображения PNG, JPEG, WebP и GIF.'
+            )
+        return f'image.{extension}'
+
+
+def get_image_data(request, field_name):
+    """
+    Возвращает данные запроса для сериализатора изображения.
+    Изображение, переданное телом запроса, подставляется
+    в поле field_name.
+    """
+    if (
+        field_name not in request.data
+        and UPLOAD_FIELD_NAME in request.FILES
+    ):
+        return {field_name: request.FILES[UPLOAD_FIELD_NAME]}
+    return request.data
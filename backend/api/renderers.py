@@ -0,0 +1,26 @@
+from rest_framework import renderers
+
+
+class PlainTextRenderer(renderers.BaseRenderer):
+    """
+    Рендерер текстового формата.
+
+    Используется для выбора формата списка покупок через параметр
+    запроса format или заголовок Accept. Сам список отдается потоково
+    во вьюсете, поэтому рендерер обрабатывает только сообщения об ошибках.
+    """
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Преобразует данные ответа в строку."""
+        if data is None:
+            return b''
+        return str(data).encode(self.charset)
+
+
+class CSVRenderer(PlainTextRenderer):
+    """Рендерер формата CSV."""
+    media_type = 'text/csv'
+    format = 'csv'
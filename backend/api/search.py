@@ -0,0 +1,161 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from food.models import Ingredient, Tag, normalize_name
+
+INDEX_TIMEOUT = 300
+NGRAM_SIZE = 3
+SHORT_QUERY_SCAN_LIMIT = 2000
+
+
+class InMemoryIndex:
+    """
+    Базовый класс индекса в памяти процесса.
+
+    Индекс строится методом _build при первом обращении,
+    сбрасывается сигналами при изменении данных и перестраивается
+    не реже, чем раз в INDEX_TIMEOUT секунд, чтобы подхватывать
+    изменения, сделанные в других процессах.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = None
+        self._built_at = 0
+
+    def invalidate(self):
+        """Сбрасывает индекс; он будет построен заново при обращении."""
+        self._entries = None
+
+    def _get_entries(self):
+        """Возвращает записи индекса, при необходимости строя их заново."""
+        entries = self._entries
+        if (
+            entries is not None
+            and time.monotonic() - self._built_at < INDEX_TIMEOUT
+        ):
+            return entries
+        with self._lock:
+            if self._entries is entries:
+                self._entries = self._build()
+                self._built_at = time.monotonic()
+            return self._entries
+
+    def _build(self):
+        """Загружает записи индекса из базы данных."""
+        raise NotImplementedError
+
+
+class IngredientIndex(InMemoryIndex):
+    """
+    Индекс ингредиентов для автодополнения.
+
+    Хранит отсортированный список нормализованных названий
+    и ищет по началу названия двоичным поиском. Для поиска
+    по вхождению хранит триграммы: каждой подстроке длиной
+    NGRAM_SIZE сопоставлено множество позиций названий, где она
+    встречается. Кандидаты — пересечение множеств для триграмм
+    запроса, каждый из них проверяется на полное вхождение.
+    Триграммы занимают память порядка суммарной длины названий,
+    зато поиск не перебирает весь список. Запросы короче
+    NGRAM_SIZE ищутся перебором, но не дальше первых
+    SHORT_QUERY_SCAN_LIMIT названий: на таких запросах совпадений
+    по началу обычно хватает, а часть совпадений по вхождению
+    может не попасть в ответ.
+    """
+
+    def _build(self):
+        """
+        Загружает ингредиенты одним запросом, сортирует их по названию
+        и строит триграммы названий.
+        """
+        ingredients = sorted(
+            (
+                (ingredient.search_name, ingredient)
+                for ingredient in Ingredient.objects.all()
+            ),
+            key=lambda entry: (entry[0], entry[1].measurement_unit)
+        )
+        keys = [key for key, _ in ingredients]
+        ngrams = defaultdict(set)
+        for position, key in enumerate(keys):
+            for start in range(len(key) - NGRAM_SIZE + 1):
+                ngrams[key[start:start + NGRAM_SIZE]].add(position)
+        return (
+            keys,
+            [ingredient for _, ingredient in ingredients],
+            dict(ngrams)
+        )
+
+    def _find_containing(self, keys, ngrams, query):
+        """Возвращает по возрастанию позиции названий, содержащих query."""
+        if len(query) < NGRAM_SIZE:
+            return (
+                position
+                for position, key in enumerate(
+                    keys[:SHORT_QUERY_SCAN_LIMIT]
+                )
+                if query in key
+            )
+        postings = sorted(
+            (
+                ngrams.get(query[start:start + NGRAM_SIZE], set())
+                for start in range(len(query) - NGRAM_SIZE + 1)
+            ),
+            key=len
+        )
+        candidates = postings[0].intersection(*postings[1:])
+        return sorted(
+            position for position in candidates if query in keys[position]
+        )
+
+    def search(self, query, limit):
+        """
+        Возвращает не более limit ингредиентов, в названии которых
+        встречается query. Сначала идут совпадения по началу названия.
+        """
+        keys, ingredients, ngrams = self._get_entries()
+        query = normalize_name(query)
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + '\uffff', start)
+        result = ingredients[start:min(end, start + limit)]
+        if len(result) >= limit:
+            return result
+        for position in self._find_containing(keys, ngrams, query):
+            if not start <= position < end:
+                result.append(ingredients[position])
+                if len(result) >= limit:
+                    break
+        return result
+
+
+class TagIndex(InMemoryIndex):
+    """Соответствие slug тегов их id для фильтрации рецептов по тегам."""
+
+    def _build(self):
+        """Загружает slug и id всех тегов одним запросом."""
+        return dict(Tag.objects.values_list('slug', 'id'))
+
+    def get_ids(self, slugs):
+        """
+        Возвращает id тегов с указанными slug. Если каких-то slug
+        нет в индексе (тег создан в другом процессе), они ищутся
+        в базе данных, и при находке индекс сбрасывается.
+        Несуществующие slug пропускаются.
+        """
+        entries = self._get_entries()
+        missing = [slug for slug in slugs if slug not in entries]
+        if missing:
+            found = dict(
+                Tag.objects.filter(slug__in=missing).values_list('slug', 'id')
+            )
+            if found:
+                self.invalidate()
+                entries = {**entries, **found}
+        return [entries[slug] for slug in slugs if slug in entries]
+
+
+ingredient_index = IngredientIndex()
+tag_index = TagIndex()
@@ -1,12 +1,18 @@
 from django.shortcuts import get_object_or_404
-from django.core.files.base import ContentFile
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserSerializer
-import base64
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 
 from users.models import User, Subscription
+from .images import decode_base64_image, get_variant_urls, is_base64_image
+from .utils import (
+    BULK_RECIPES_LIMIT,
+    get_recipes_limit,
+    get_subscribed_author_ids
+)
 from food.models import (
     Tag, Ingredient, Recipe, Favorite,
     ShoppingCart, RecipeIngredient
@@ -67,6 +73,22 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
         ).data
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    """
+    Сериализатор списка id рецептов для массового добавления
+    в избранное или список покупок и удаления из них.
+    """
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_RECIPES_LIMIT
+    )
+
+    def validate_recipes(self, value):
+        """Убирает повторяющиеся id, сохраняя их порядок."""
+        return list(dict.fromkeys(value))
+
+
 class IngredientSerializer(serializers.ModelSerializer):
     """Сериализатор для запросов к Ingredient."""
 
@@ -101,9 +123,73 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         )
 
 
+def get_objects_in_bulk(queryset, ids, error_message):
+    """
+    Загружает объекты queryset с переданными id одним запросом in_bulk.
+    Если каких-то объектов нет, выбрасывает одну ошибку валидации
+    со всеми отсутствующими id.
+    """
+    objects = queryset.in_bulk(set(ids))
+    missing = [pk for pk in dict.fromkeys(ids) if pk not in objects]
+    if missing:
+        raise serializers.ValidationError(
+            error_message.format(ids=', '.join(map(str, missing)))
+        )
+    return objects
+
+
+class PrimaryKeyListField(serializers.ListField):
+    """
+    Поле списка id объектов queryset. В отличие от
+    PrimaryKeyRelatedField(many=True) загружает все объекты
+    одним запросом и сообщает обо всех несуществующих id сразу.
+    """
+    child = serializers.IntegerField(min_value=1)
+    default_error_messages = {
+        'does_not_exist': 'Объекты с id {ids} не существуют.'
+    }
+
+    def __init__(self, queryset, **kwargs):
+        self.queryset = queryset
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        """Возвращает список объектов в порядке переданных id."""
+        ids = super().to_internal_value(data)
+        objects = get_objects_in_bulk(
+            self.queryset.all(),
+            ids,
+            self.error_messages['does_not_exist']
+        )
+        return [objects[pk] for pk in ids]
+
+
+class RecipeIngredientWriteListSerializer(serializers.ListSerializer):
+    """
+    Сериализатор списка ингредиентов рецепта. Загружает все
+    ингредиенты одним запросом вместо запроса на каждый id.
+    """
+
+    def to_internal_value(self, data):
+        """Заменяет id ингредиентов объектами Ingredient."""
+        ingredients = super().to_internal_value(data)
+        objects = get_objects_in_bulk(
+            Ingredient.objects.all(),
+            [
+                ingredient['id'] for ingredient in ingredients
+                if 'id' in ingredient
+            ],
+            'Ингредиенты с id {ids} не существуют.'
+        )
+        for ingredient in ingredients:
+            if 'id' in ingredient:
+                ingredient['id'] = objects[ingredient['id']]
+        return ingredients
+
+
 class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
     '''Сериализатор для модели RecipeIngredient.'''
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField(min_value=1)
 
     class Meta:
         model = RecipeIngredient
@@ -111,6 +197,7 @@ class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
             'id',
             'amount'
         )
+        list_serializer_class = RecipeIngredientWriteListSerializer
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -132,29 +219,69 @@ class Base64ImageField(serializers.ImageField):
 
     Это поле позволяет клиенту отправлять данные изображения в виде строки
     в кодировке Base64 в полезных данных запроса.
-    Затем поле декодирует строку и создаст объект ContentFile,
-    который можно сохранить в базе данных.
-
-    Поле ожидает, что данные изображения будут
-    в формате `data:image/png;base64,<base64_data>`.
+    Поле декодирует строку частями во временный файл
+    (decode_base64_image), который затем сохраняется в базе данных.
+
+    Поле ожидает, что данные изображения будут в формате
+    `data:image/<png|jpeg|webp|gif>;base64,<base64_data>`, и отклоняет
+    изображения больше settings.MAX_IMAGE_SIZE байт до декодирования.
+    Также принимаются файлы, загруженные через multipart/form-data
+    или телом запроса (ImageUploadParser).
     """
     def to_internal_value(self, data):
         """
         Переопределяет метод to_internal_value() по умолчанию
         для обработки данных изображения в кодировке Base64.
         """
-        if isinstance(data, str) and data.startswith('data:image/png'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+        if is_base64_image(data):
+            data = decode_base64_image(data, settings.MAX_IMAGE_SIZE)
+        elif getattr(data, 'size', 0) > settings.MAX_IMAGE_SIZE:
+            raise serializers.ValidationError(
+                'Размер изображения не должен превышать '
+                f'{settings.MAX_IMAGE_SIZE} байт.'
+            )
 
         return super().to_internal_value(data)
 
 
+class ImageVariantsField(serializers.Field):
+    """
+    Поле со ссылками на уменьшенные копии изображения в формате WebP.
+    Пока копии не созданы, в поле отдаются ссылки на оригинал.
+    Готовность копий берется из поля модели variants_field
+    (имя изображения, для которого копии созданы).
+    """
+
+    def __init__(self, variants_field, **kwargs):
+        self.variants_field = variants_field
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        """Возвращает словарь ссылок на копии изображения."""
+        if not value:
+            return None
+        request = self.context.get('request')
+        urls = get_variant_urls(
+            value.name,
+            getattr(value.instance, self.variants_field) == value.name
+        )
+        if request is None:
+            return urls
+        return {
+            variant: request.build_absolute_uri(url)
+            for variant, url in urls.items()
+        }
+
+
 class UserSerializer(UserSerializer):
     """Сериализатор пользователя."""
     is_subscribed = serializers.SerializerMethodField(read_only=True)
     avatar = Base64ImageField(required=False, allow_null=True, read_only=True)
+    avatar_variants = ImageVariantsField(
+        'avatar_variants_source',
+        source='avatar'
+    )
     extra_kwargs = {'password': {'write_only': True},
                     'is_subscribed': {'read_only': True}}
 
@@ -167,18 +294,13 @@ class UserSerializer(UserSerializer):
             'first_name',
             'last_name',
             'is_subscribed',
-            'avatar'
+            'avatar',
+            'avatar_variants'
         )
 
     def get_is_subscribed(self, obj):
         """Проверяет, подписан ли текущий пользователь на указанный объект."""
-        user = self.context.get('request').user
-        if not user.is_anonymous:
-            return Subscription.objects.filter(
-                user=user,
-                author=obj
-            ).exists()
-        return False
+        return obj.id in get_subscribed_author_ids(self.context)
 
     def create(self, validated_data):
         """Создает нового пользователя с указанными данными."""
@@ -187,6 +309,10 @@ class UserSerializer(UserSerializer):
 
 class RecipeShortSerializer(serializers.ModelSerializer):
     """Сериализатор для показа сокращенной информации о рецепте."""
+    image_variants = ImageVariantsField(
+        'image_variants_source',
+        source='image'
+    )
 
     class Meta:
         model = Recipe
@@ -194,6 +320,7 @@ class RecipeShortSerializer(serializers.ModelSerializer):
             'id',
             'name',
             'image',
+            'image_variants',
             'cooking_time'
         )
 
@@ -208,6 +335,10 @@ class RecipeSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
+    image_variants = ImageVariantsField(
+        'image_variants_source',
+        source='image'
+    )
 
     class Meta:
         model = Recipe
@@ -220,6 +351,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time'
         )
@@ -228,7 +360,12 @@ class RecipeSerializer(serializers.ModelSerializer):
         """
         Проверяет, добавлен ли переданный объект obj
         в список избранного текущим пользователем.
+
+        Использует значение, аннотированное в RecipeViewSet.get_queryset,
+        и выполняет запрос только если аннотации нет.
         """
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if request.user.is_authenticated:
             return Favorite.objects.filter(
@@ -241,7 +378,12 @@ class RecipeSerializer(serializers.ModelSerializer):
         """
         Проверяет, добавлен ли переданный объект obj
         в корзину покупок текущего пользователя.
+
+        Использует значение, аннотированное в RecipeViewSet.get_queryset,
+        и выполняет запрос только если аннотации нет.
         """
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if request.user.is_authenticated:
             return ShoppingCart.objects.filter(
@@ -259,10 +401,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     )
     image = Base64ImageField()
     ingredients = RecipeIngredientWriteSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True
-    )
+    tags = PrimaryKeyListField(queryset=Tag.objects.all())
 
     class Meta:
         model = Recipe
@@ -280,6 +419,8 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     def create_ingredients(self, recipe, ingredients):
         """Вспомогательная функция для добавления ингредиентов.
         Используется при создании/редактировании рецепта."""
+        if not ingredients:
+            return
         RecipeIngredient.objects.bulk_create(
             [
                 RecipeIngredient(
@@ -300,6 +441,45 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         self.create_ingredients(recipe=recipe, ingredients=ingredients)
         return recipe
 
+    def update_ingredients(self, recipe, ingredients):
+        """Вспомогательная функция для изменения ингредиентов рецепта.
+
+        Сравнивает переданные ингредиенты с сохраненными и выполняет
+        только необходимые изменения: создает новые записи, обновляет
+        количество измененных одним bulk_update и удаляет убранные.
+        Неизмененные записи не перезаписываются.
+        """
+        amounts = {
+            ingredient['id'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        existing = {}
+        removed = []
+        for recipe_ingredient in RecipeIngredient.objects.filter(
+            recipe=recipe
+        ).only('id', 'ingredient_id', 'amount'):
+            ingredient_id = recipe_ingredient.ingredient_id
+            if ingredient_id not in amounts or ingredient_id in existing:
+                removed.append(recipe_ingredient.id)
+            else:
+                existing[ingredient_id] = recipe_ingredient
+        changed = []
+        for ingredient_id, recipe_ingredient in existing.items():
+            if recipe_ingredient.amount != amounts[ingredient_id]:
+                recipe_ingredient.amount = amounts[ingredient_id]
+                changed.append(recipe_ingredient)
+        if removed:
+            RecipeIngredient.objects.filter(id__in=removed).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        self.create_ingredients(
+            recipe,
+            [
+                ingredient for ingredient in ingredients
+                if ingredient['id'].id not in existing
+            ]
+        )
+
     @transaction.atomic
     def update(self, instance, validated_data):
         """Обновляет существующий рецепт в базе данных."""
@@ -307,15 +487,24 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         ingredients = validated_data.pop('ingredients')
         instance = super().update(instance, validated_data)
         instance.tags.set(tags)
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        self.create_ingredients(instance, ingredients)
+        self.update_ingredients(instance, ingredients)
         return instance
 
     def to_representation(self, instance):
         """
         Метод для преобразования объекта модели
         в сериализованное представление.
+        Ингредиенты рецепта загружаются вместе с самими ингредиентами
+        одним запросом.
         """
+        prefetch_related_objects(
+            (instance,),
+            Prefetch(
+                'ingredient_in_recipe',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+            'tags'
+        )
         return RecipeSerializer(
             instance,
             context={'request': self.context.get('request')}
@@ -330,7 +519,6 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Забыли добавить ингредиенты в рецепт'
             )
-        ingredients_list = []
         ingredients = data.get('ingredients')
         if not ingredients:
             raise serializers.ValidationError(
@@ -338,23 +526,20 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             )
 
         for ingredient in ingredients:
-            if ingredient.get('amount') <= 0:
+            if ingredient.get('amount', 0) <= 0:
                 raise serializers.ValidationError(
                     'Количество не может быть меньше 1'
                 )
-
-            ingredient_id = ingredient.get('id')
-            if not ingredient_id:
+            if 'id' not in ingredient:
                 raise serializers.ValidationError(
                     'Поле "id" ингредиента не может быть пустым'
                 )
 
-            if ingredient_id in ingredients_list:
-                raise serializers.ValidationError(
-                    'Вы пытаетесь добавить в рецепт два одинаковых ингредиента'
-                )
-
-            ingredients_list.append(ingredient_id)
+        ingredient_set = {ingredient['id'] for ingredient in ingredients}
+        if len(ingredient_set) != len(ingredients):
+            raise serializers.ValidationError(
+                'Вы пытаетесь добавить в рецепт два одинаковых ингредиента'
+            )
 
         tags = data.get('tags', [])
         if not tags:
@@ -369,6 +554,15 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         return data
 
 
+class RecipeImageSerializer(serializers.ModelSerializer):
+    """Сериализатор для замены изображения рецепта."""
+    image = Base64ImageField()
+
+    class Meta:
+        model = Recipe
+        fields = ('image',)
+
+
 class AvatarSerializer(serializers.Serializer):
     """Сериализатор аватара."""
     avatar = Base64ImageField(required=True, allow_null=True)
@@ -380,12 +574,13 @@ class AvatarSerializer(serializers.Serializer):
 class SubscriptionSerializer(serializers.ModelSerializer):
     """Просмотр списка подписок пользователя."""
 
-    recipes_count = serializers.IntegerField(
-        source='recipes.count',
-        read_only=True
-    )
+    recipes_count = serializers.SerializerMethodField(read_only=True)
     is_subscribed = serializers.SerializerMethodField(read_only=True)
-    recipes = RecipeShortSerializer(many=True, read_only=True)
+    recipes = serializers.SerializerMethodField(read_only=True)
+    avatar_variants = ImageVariantsField(
+        'avatar_variants_source',
+        source='avatar'
+    )
 
     class Meta:
         model = User
@@ -398,16 +593,37 @@ class SubscriptionSerializer(serializers.ModelSerializer):
             'is_subscribed',
             'recipes',
             'recipes_count',
-            'avatar'
+            'avatar',
+            'avatar_variants'
         )
 
     def get_is_subscribed(self, obj):
         """Проверяет, подписан ли текущий пользователь на переданный объект."""
-        request = self.context.get('request')
-        user = self.context['request'].user
-        if not request or not user.is_authenticated:
-            return False
-        return obj.following.filter(user=user).exists()
+        return obj.id in get_subscribed_author_ids(self.context)
+
+    def get_recipes(self, obj):
+        """
+        Возвращает рецепты автора, не больше recipes_limit из запроса.
+        Использует рецепты, предзагруженные в UserViewSet.subscriptions.
+        """
+        recipes = obj.recipes.all()
+        recipes_limit = get_recipes_limit(self.context['request'])
+        if recipes_limit:
+            recipes = recipes[:recipes_limit]
+        return RecipeShortSerializer(
+            recipes,
+            many=True,
+            context=self.context
+        ).data
+
+    def get_recipes_count(self, obj):
+        """
+        Возвращает количество рецептов автора. Использует значение,
+        аннотированное в UserViewSet.subscriptions, если оно есть.
+        """
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
+        return obj.recipes.count()
 
 
 class SubscribeSerializer(serializers.Serializer):
@@ -0,0 +1,282 @@
+import atexit
+import logging
+import re
+import string
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import DataError, connection
+from django.db.models import F
+from shortener.models import Url
+
+from food.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+BASE62_ALPHABET = string.digits + string.ascii_letters
+BASE62_INDEX = {char: index for index, char in enumerate(BASE62_ALPHABET)}
+LEGACY_CODE_LENGTH = 6
+LEGACY_RECIPE_PATH = re.compile(r'^/recipes/(\d+)/?$')
+HITS_FLUSH_BATCH_SIZE = 500
+MAX_RECIPE_ID = 2 ** 63 - 1
+MAX_CODE_LENGTH = 11
+RECIPE_CHECK_TIMEOUT = 60
+
+_MISSING = object()
+
+
+def encode_base62(number):
+    """Возвращает запись неотрицательного числа number в base62."""
+    if number < 0:
+        raise ValueError('Число должно быть неотрицательным.')
+    digits = []
+    while True:
+        number, remainder = divmod(number, len(BASE62_ALPHABET))
+        digits.append(BASE62_ALPHABET[remainder])
+        if not number:
+            return ''.join(reversed(digits))
+
+
+def decode_base62(code):
+    """
+    Возвращает число, записанное в base62 строкой code.
+    Для пустой строки, посторонних символов и ведущих нулей
+    вызывает ValueError, чтобы у каждого числа был один код.
+    """
+    if not code or (code[0] == '0' and len(code) > 1):
+        raise ValueError(f'Некорректный код: {code}')
+    number = 0
+    for char in code:
+        try:
+            number = number * len(BASE62_ALPHABET) + BASE62_INDEX[char]
+        except KeyError:
+            raise ValueError(f'Некорректный код: {code}') from None
+    return number
+
+
+class LRUCache:
+    """
+    Потокобезопасный кэш в памяти процесса, ограниченный maxsize
+    записями. При переполнении вытесняется запись, к которой
+    дольше всего не обращались.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        """Возвращает значение по ключу key или default."""
+        with self._lock:
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                return default
+            return self._entries[key]
+
+    def set(self, key, value):
+        """Сохраняет значение по ключу key."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Удаляет значение по ключу key, если оно есть."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Очищает кэш."""
+        with self._lock:
+            self._entries.clear()
+
+
+class HitCounter:
+    """
+    Счетчик переходов по коротким ссылкам.
+
+    Переходы накапливаются в памяти процесса и раз в interval
+    секунд записываются в Recipe.short_link_hits фоновым потоком:
+    отдельным запросом UPDATE на каждую группу рецептов с одинаковым
+    приростом. Если запись группы не удалась, она повторяется
+    по одному рецепту: переходы на некорректные id отбрасываются,
+    а не записанные по другим причинам возвращаются в счетчик
+    до следующей попытки.
+    Между записями счетчик хранит не больше maxsize рецептов, переходы
+    на остальные рецепты отбрасываются. При завершении процесса
+    накопленные переходы записываются сразу.
+    """
+
+    def __init__(self, interval, maxsize):
+        self.interval = interval
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._hits = Counter()
+        self._thread = None
+
+    def add(self, recipe_id):
+        """Учитывает переход по ссылке на рецепт recipe_id."""
+        with self._lock:
+            if (
+                recipe_id in self._hits
+                or len(self._hits) < self.maxsize
+            ):
+                self._hits[recipe_id] += 1
+            if self._thread is None:
+                self._start()
+
+    def flush(self):
+        """
+        Записывает накопленные переходы в базу данных.
+        Возвращает число рецептов, для которых они записаны.
+        """
+        with self._lock:
+            hits, self._hits = self._hits, Counter()
+        if not hits:
+            return 0
+        recipe_ids = defaultdict(list)
+        for recipe_id, delta in hits.items():
+            recipe_ids[delta].append(recipe_id)
+        written = 0
+        for delta, ids in recipe_ids.items():
+            for start in range(0, len(ids), HITS_FLUSH_BATCH_SIZE):
+                batch = ids[start:start + HITS_FLUSH_BATCH_SIZE]
+                try:
+                    self._write(batch, delta)
+                except Exception:
+                    written += self._write_each(batch, delta)
+                else:
+                    written += len(batch)
+        return written
+
+    def _write(self, recipe_ids, delta):
+        """Увеличивает на delta счетчики переходов рецептов recipe_ids."""
+        Recipe.objects.filter(id__in=recipe_ids).update(
+            short_link_hits=F('short_link_hits') + delta
+        )
+
+    def _write_each(self, recipe_ids, delta):
+        """
+        Записывает переходы по одному рецепту после неудачной записи
+        группы. Некорректные идентификаторы отбрасываются, переходы,
+        не записанные по другим причинам, возвращаются в счетчик.
+        """
+        written = 0
+        for recipe_id in recipe_ids:
+            try:
+                self._write((recipe_id,), delta)
+            except (DataError, OverflowError):
+                logger.warning(
+                    'Отброшены переходы на рецепт %s', recipe_id
+                )
+            except Exception:
+                logger.exception('Не удалось записать переходы по ссылкам')
+                with self._lock:
+                    self._hits[recipe_id] += delta
+            else:
+                written += 1
+        return written
+
+    def _start(self):
+        """Запускает фоновый поток записи переходов."""
+        self._thread = threading.Thread(
+            target=self._run,
+            name='short-link-hits',
+            daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        """Записывает переходы раз в interval секунд."""
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+            connection.close()
+
+
+legacy_link_cache = LRUCache(settings.SHORT_LINK_CACHE_SIZE)
+recipe_id_cache = LRUCache(settings.SHORT_LINK_CACHE_SIZE)
+hit_counter = HitCounter(
+    settings.SHORT_LINK_FLUSH_INTERVAL,
+    settings.SHORT_LINK_CACHE_SIZE
+)
+
+
+def get_short_code(recipe_id):
+    """Возвращает код короткой ссылки на рецепт recipe_id."""
+    return encode_base62(recipe_id)
+
+
+def get_legacy_recipe_id(code):
+    """
+    Возвращает идентификатор рецепта для ссылки code, созданной
+    до появления кодов из идентификаторов (таблица shortener.Url),
+    или None, если такой ссылки нет.
+    """
+    long_url = Url.objects.filter(short_id=code).order_by(
+        'id'
+    ).values_list('long_url', flat=True).first()
+    if long_url is None:
+        return None
+    match = LEGACY_RECIPE_PATH.match(urlsplit(long_url).path)
+    return int(match[1]) if match else None
+
+
+def recipe_exists(recipe_id):
+    """
+    Проверяет, есть ли рецепт recipe_id. Результат хранится
+    в ограниченном LRU-кэше RECIPE_CHECK_TIMEOUT секунд, чтобы
+    подхватить рецепты, созданные или удаленные в других процессах.
+    Рецепты, удаленные в этом процессе, убираются из кэша сразу
+    (forget_recipe).
+    """
+    if not 0 < recipe_id <= MAX_RECIPE_ID:
+        return False
+    cached = recipe_id_cache.get(recipe_id)
+    if cached is not None:
+        exists, checked_at = cached
+        if time.monotonic() - checked_at < RECIPE_CHECK_TIMEOUT:
+            return exists
+    exists = Recipe.objects.filter(id=recipe_id).exists()
+    recipe_id_cache.set(recipe_id, (exists, time.monotonic()))
+    return exists
+
+
+def forget_recipe(recipe_id):
+    """Убирает рецепт recipe_id из кэша проверок recipe_exists."""
+    recipe_id_cache.delete(recipe_id)
+
+
+def resolve_short_code(code):
+    """
+    Возвращает идентификатор рецепта по коду короткой ссылки
+    или None, если код не ведет на существующий рецепт.
+
+    Код из идентификатора рецепта декодируется без обращения
+    к базе данных. Прежние случайные коды длиной LEGACY_CODE_LENGTH
+    ищутся в таблице shortener.Url; результат, в том числе
+    отсутствие ссылки, хранится в ограниченном LRU-кэше. Наличие
+    рецепта проверяется через recipe_exists, поэтому к базе
+    обращается только первый переход на каждый рецепт.
+    """
+    if len(code) > MAX_CODE_LENGTH:
+        return None
+    recipe_id = None
+    if len(code) == LEGACY_CODE_LENGTH:
+        recipe_id = legacy_link_cache.get(code, _MISSING)
+        if recipe_id is _MISSING:
+            recipe_id = get_legacy_recipe_id(code)
+            legacy_link_cache.set(code, recipe_id)
+    if recipe_id is None:
+        try:
+            recipe_id = decode_base62(code)
+        except ValueError:
+            return None
+    return recipe_id if recipe_exists(recipe_id) else None
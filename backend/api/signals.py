@@ -0,0 +1,122 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from food.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import Subscription, User
+from .caching import invalidate_cache
+from .feed import (
+    add_subscription_to_feed,
+    fan_out_recipe,
+    remove_subscription_from_feed
+)
+from .images import schedule_image_variants
+from .search import ingredient_index, tag_index
+from .shortlinks import forget_recipe
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredients(sender, **kwargs):
+    """
+    Сбрасывает индекс и кэш ответов ингредиентов
+    при изменении ингредиента.
+    """
+    ingredient_index.invalidate()
+    invalidate_cache('ingredients')
+    invalidate_cache('recipes')
+
+
+@receiver(post_save, sender=Ingredient)
+def touch_ingredient_recipes(sender, instance, created, **kwargs):
+    """
+    Обновляет время изменения рецептов с ингредиентом при изменении
+    его названия или единицы измерения.
+    """
+    if not created:
+        Recipe.objects.filter(ingredients=instance).update(
+            updated=timezone.now()
+        )
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def touch_recipe(sender, instance, **kwargs):
+    """Обновляет время изменения рецепта при изменении его ингредиентов."""
+    Recipe.objects.filter(pk=instance.recipe_id).update(
+        updated=timezone.now()
+    )
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    """
+    Сбрасывает индекс тегов и кэш ответов тегов и рецептов
+    при изменении тега.
+    """
+    tag_index.invalidate()
+    invalidate_cache('tags')
+    invalidate_cache('recipes')
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipes(sender, **kwargs):
+    """Сбрасывает кэш списка рецептов при изменении рецепта."""
+    invalidate_cache('recipes')
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_recipe_authors(sender, update_fields=None, **kwargs):
+    """
+    Сбрасывает кэш списка рецептов при изменении пользователя,
+    кроме обновления только времени последнего входа.
+    """
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    invalidate_cache('recipes')
+
+
+@receiver(post_save, sender=Recipe)
+def add_recipe_to_feeds(sender, instance, created, **kwargs):
+    """Добавляет новый рецепт в материализованные ленты подписчиков."""
+    if created:
+        fan_out_recipe(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def forget_deleted_recipe(sender, instance, **kwargs):
+    """
+    После фиксации транзакции убирает удаленный рецепт из кэша
+    проверок коротких ссылок.
+    """
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: forget_recipe(recipe_id))
+
+
+@receiver(post_save, sender=Subscription)
+def add_subscription_to_feeds(sender, instance, created, **kwargs):
+    """Обновляет материализованную ленту пользователя после подписки."""
+    if created:
+        add_subscription_to_feed(instance)
+
+
+@receiver(post_delete, sender=Subscription)
+def remove_subscription_from_feeds(sender, instance, **kwargs):
+    """Обновляет материализованную ленту пользователя после отписки."""
+    remove_subscription_from_feed(instance)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=User)
+def generate_image_variants(sender, instance, update_fields=None, **kwargs):
+    """
+    После фиксации транзакции ставит в очередь создание уменьшенных
+    копий изображения рецепта или аватара пользователя.
+    """
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    image = instance.image if sender is Recipe else instance.avatar
+    if image:
+        name = image.name
+        transaction.on_commit(lambda: schedule_image_variants(name))
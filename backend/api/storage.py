@@ -0,0 +1,44 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+class ContentHashStorage(FileSystemStorage):
+    """
+    Файловое хранилище, называющее файлы по хешу их содержимого.
+
+    Файл сохраняется как <каталог>/<sha256>.<расширение>, поэтому
+    одинаковые изображения хранятся один раз: если файл с таким именем
+    уже есть, он не перезаписывается, а возвращается его имя.
+    """
+
+    def save(self, name, content, max_length=None):
+        """Сохраняет файл под именем, построенным из хеша содержимого."""
+        if name is None:
+            name = content.name
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        name = os.path.join(directory, f'{digest.hexdigest()}{extension}')
+        return self.save_as(name, content, max_length)
+
+    def save_as(self, name, content, max_length=None):
+        """
+        Сохраняет файл под именем name, если такого файла еще нет.
+        Временный файл загрузки перемещается в хранилище, после чего
+        закрывается, так как его больше нет по прежнему пути.
+        """
+        name = self.generate_filename(name)
+        if self.exists(name):
+            return name
+        name = super().save(name, content, max_length)
+        if hasattr(content, 'temporary_file_path'):
+            content.close()
+        return name
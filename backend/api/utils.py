@@ -1,8 +1,142 @@
+import csv
+import hashlib
+import json
+
 from rest_framework import status
 from rest_framework.response import Response
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+
+from food.models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from users.models import Subscription, User
+
+
+def get_subscribed_author_ids(context):
+    """Вспомогательная функция, возвращающая множество id авторов,
+       на которых подписан текущий пользователь.
+
+    Множество загружается одним запросом и сохраняется в контексте
+    сериализатора, поэтому вложенные сериализаторы списка
+    не обращаются к базе данных для каждого автора.
+    """
+    if 'subscribed_author_ids' not in context:
+        request = context.get('request')
+        if not request or not request.user.is_authenticated:
+            return set()
+        context['subscribed_author_ids'] = set(
+            Subscription.objects.filter(
+                user=request.user
+            ).values_list('author_id', flat=True)
+        )
+    return context['subscribed_author_ids']
+
+
+def get_recipes_limit(request):
+    """Вспомогательная функция, возвращающая значение параметра
+       recipes_limit запроса или None, если он не задан или некорректен.
+    """
+    try:
+        recipes_limit = int(request.query_params['recipes_limit'])
+    except (KeyError, ValueError):
+        return None
+    return recipes_limit if recipes_limit > 0 else None
+
+
+def get_author_recipes(recipes_limit):
+    """Вспомогательная функция, возвращающая queryset рецептов
+       для предзагрузки рецептов авторов.
+
+    Если задан recipes_limit, у каждого автора выбираются только
+    recipes_limit последних рецептов. Ограничение выполняется
+    коррелированным подзапросом, поэтому рецепты всех авторов
+    страницы загружаются одним запросом.
+    """
+    recipes = Recipe.objects.all()
+    if recipes_limit:
+        recipes = recipes.filter(
+            id__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('id')[:recipes_limit]
+            )
+        )
+    return recipes
+
+
+def set_recipe_user_flags(recipes, context):
+    """Вспомогательная функция, проставляющая в сериализованных рецептах
+       флаги is_favorited, is_in_shopping_cart и is_subscribed
+       для текущего пользователя.
+
+    Используется для страниц списка рецептов из общего кэша:
+    флаги всех рецептов страницы загружаются двумя запросами.
+    """
+    request = context.get('request')
+    favorited = in_shopping_cart = set()
+    recipe_ids = [recipe['id'] for recipe in recipes]
+    if request and request.user.is_authenticated and recipe_ids:
+        favorited = set(
+            Favorite.objects.filter(
+                user=request.user,
+                recipe_id__in=recipe_ids
+            ).values_list('recipe_id', flat=True)
+        )
+        in_shopping_cart = set(
+            ShoppingCart.objects.filter(
+                user=request.user,
+                recipe_id__in=recipe_ids
+            ).values_list('recipe_id', flat=True)
+        )
+    subscribed = get_subscribed_author_ids(context)
+    for recipe in recipes:
+        recipe['is_favorited'] = recipe['id'] in favorited
+        recipe['is_in_shopping_cart'] = recipe['id'] in in_shopping_cart
+        recipe['author']['is_subscribed'] = (
+            recipe['author']['id'] in subscribed
+        )
+    return recipes
+
+
+BULK_RECIPES_LIMIT = 100
+BULK_CREATED = 'created'
+BULK_DELETED = 'deleted'
+BULK_EXISTS = 'exists'
+BULK_ABSENT = 'absent'
+BULK_NOT_FOUND = 'not_found'
+
+RECIPE_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'cart_count',
+}
+
+
+def update_recipe_counter(model_name, recipe_ids, delta):
+    """Вспомогательная функция, изменяющая на delta счетчик рецептов
+       recipe_ids, соответствующий модели model_name.
+
+    Счетчик изменяется выражением F() в одном запросе UPDATE,
+    поэтому одновременные изменения не теряются.
+    """
+    counter = RECIPE_COUNTERS[model_name]
+    Recipe.objects.filter(id__in=recipe_ids).update(
+        **{counter: F(counter) + delta}
+    )
 
-from food.models import Ingredient, RecipeIngredient
+
+def lock_user(user):
+    """Вспомогательная функция, блокирующая запись пользователя
+       до конца текущей транзакции.
+
+    Добавления в избранное и список покупок одного пользователя
+    выполняются под этой блокировкой по очереди, поэтому проверка
+    уже добавленных рецептов остается верной до вставки записей
+    и счетчики рецептов не увеличиваются за пропущенные вставки.
+    """
+    list(
+        User.objects.select_for_update().filter(
+            pk=user.pk
+        ).values_list('pk', flat=True)
+    )
 
 
 def create_model_instance(request, instance, serializer_name):
@@ -21,7 +155,10 @@ def create_model_instance(request, instance, serializer_name):
     serializer.is_valid(
         raise_exception=True
     )
-    serializer.save()
+    with transaction.atomic():
+        lock_user(request.user)
+        serializer.save()
+        update_recipe_counter(serializer.Meta.model, (instance.id,), 1)
     return Response(
         serializer.data,
         status=status.HTTP_201_CREATED
@@ -32,39 +169,201 @@ def delete_model_instance(request, model_name, instance):
     """Вспомогательная функция для удаления рецепта
        из избранного либо из списка покупок.
     """
-    if not model_name.objects.filter(
-        user=request.user,
-        recipe=instance
-    ).exists():
+    with transaction.atomic():
+        deleted, _ = model_name.objects.filter(
+            user=request.user,
+            recipe=instance
+        ).delete()
+        if deleted:
+            update_recipe_counter(model_name, (instance.id,), -deleted)
+    if not deleted:
         return Response(
             status=status.HTTP_400_BAD_REQUEST
         )
-    model_name.objects.filter(
-        user=request.user,
-        recipe=instance
-    ).delete()
     return Response(
         status=status.HTTP_204_NO_CONTENT
     )
 
 
-def create_shopping_list(shopping_cart):
+def get_bulk_response(recipe_ids, statuses):
+    """Вспомогательная функция, возвращающая ответ с результатом
+       массовой операции для каждого id рецепта.
     """
-    Вспомогательная функция для создания текстового отчета со списком
-    необходимых ингредиентов для рецептов, содержащихся в корзине покупок.
+    return Response({
+        'results': [
+            {'id': recipe_id, 'status': statuses[recipe_id]}
+            for recipe_id in recipe_ids
+        ]
+    })
+
+
+def create_model_instances(request, recipe_ids, model_name):
+    """Вспомогательная функция для добавления нескольких
+       рецептов в избранное либо список покупок.
+
+    Существующие рецепты и уже добавленные записи определяются
+    двумя запросами под блокировкой пользователя (lock_user), новые
+    записи создаются одним bulk_create, а счетчики рецептов
+    увеличиваются одним запросом UPDATE ровно на вставленные записи.
     """
-    recipe_id = shopping_cart.values_list(
-        'recipe_id',
-        flat=True
+    statuses = dict.fromkeys(recipe_ids, BULK_NOT_FOUND)
+    with transaction.atomic():
+        lock_user(request.user)
+        found = Recipe.objects.filter(
+            id__in=recipe_ids
+        ).values_list('id', flat=True)
+        existing = set(
+            model_name.objects.filter(
+                user=request.user,
+                recipe_id__in=found
+            ).values_list('recipe_id', flat=True)
+        )
+        created = []
+        for recipe_id in found:
+            if recipe_id in existing:
+                statuses[recipe_id] = BULK_EXISTS
+            else:
+                statuses[recipe_id] = BULK_CREATED
+                created.append(recipe_id)
+        if created:
+            model_name.objects.bulk_create(
+                (
+                    model_name(user=request.user, recipe_id=recipe_id)
+                    for recipe_id in created
+                ),
+                ignore_conflicts=True
+            )
+            update_recipe_counter(model_name, created, 1)
+    return get_bulk_response(recipe_ids, statuses)
+
+
+def delete_model_instances(request, recipe_ids, model_name):
+    """Вспомогательная функция для удаления нескольких
+       рецептов из избранного либо из списка покупок.
+
+    Удаляемые записи блокируются в той же транзакции,
+    поэтому одновременные запросы не уменьшат счетчики дважды.
+    """
+    statuses = dict.fromkeys(recipe_ids, BULK_NOT_FOUND)
+    statuses.update(
+        dict.fromkeys(
+            Recipe.objects.filter(
+                id__in=recipe_ids
+            ).values_list('id', flat=True),
+            BULK_ABSENT
+        )
     )
-    buy_list = RecipeIngredient.objects.filter(recipe__in=recipe_id).values(
-        'ingredient').annotate(total_amount=Sum('amount'))
-    buy_list_text = 'Список покупок Foodgram:\n'
-    for item in buy_list:
-        ingredient = Ingredient.objects.get(pk=item['ingredient'])
-        amount = item['total_amount']
-        buy_list_text += (
-            f'{ingredient.name},'
-            f' {amount} {ingredient.measurement_unit}\n'
+    with transaction.atomic():
+        instances = model_name.objects.select_for_update().filter(
+            user=request.user,
+            recipe_id__in=recipe_ids
+        )
+        deleted = list(instances.values_list('recipe_id', flat=True))
+        if deleted:
+            model_name.objects.filter(
+                user=request.user,
+                recipe_id__in=deleted
+            ).delete()
+            update_recipe_counter(model_name, deleted, -1)
+    statuses.update(dict.fromkeys(deleted, BULK_DELETED))
+    return get_bulk_response(recipe_ids, statuses)
+
+
+class Echo:
+    """Объект-заглушка для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def get_shopping_list_items(shopping_cart):
+    """
+    Вспомогательная функция, возвращающая суммы ингредиентов
+    для рецептов, содержащихся в корзине покупок.
+
+    Суммы, названия и единицы измерения ингредиентов получаются
+    одним сгруппированным запросом.
+    """
+    return RecipeIngredient.objects.filter(
+        recipe__in=shopping_cart.values('recipe_id')
+    ).values(
+        'ingredient__name',
+        'ingredient__measurement_unit'
+    ).annotate(
+        total_amount=Sum('amount')
+    ).order_by('ingredient__name', 'ingredient__measurement_unit')
+
+
+def write_shopping_list_txt(items):
+    """Построчно формирует список покупок в текстовом формате."""
+    yield 'Список покупок Foodgram:\n'
+    for item in items:
+        yield (
+            f'{item["ingredient__name"]},'
+            f' {item["total_amount"]} {item["ingredient__measurement_unit"]}\n'
         )
-    return buy_list
+
+
+def write_shopping_list_csv(items):
+    """Построчно формирует список покупок в формате CSV."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(('Ингредиент', 'Количество', 'Единица измерения'))
+    for item in items:
+        yield writer.writerow((
+            item['ingredient__name'],
+            item['total_amount'],
+            item['ingredient__measurement_unit']
+        ))
+
+
+def write_shopping_list_json(items):
+    """Поэлементно формирует список покупок в формате JSON."""
+    yield '['
+    separator = ''
+    for item in items:
+        yield separator + json.dumps(
+            {
+                'name': item['ingredient__name'],
+                'measurement_unit': item['ingredient__measurement_unit'],
+                'amount': item['total_amount']
+            },
+            ensure_ascii=False
+        )
+        separator = ','
+    yield ']'
+
+
+SHOPPING_LIST_WRITERS = {
+    'txt': write_shopping_list_txt,
+    'csv': write_shopping_list_csv,
+    'json': write_shopping_list_json,
+}
+
+
+def stream_shopping_list(shopping_cart, list_format):
+    """
+    Вспомогательная функция, отдающая список покупок по частям
+    в указанном формате по мере чтения строк из курсора базы данных.
+    """
+    return SHOPPING_LIST_WRITERS[list_format](
+        get_shopping_list_items(shopping_cart).iterator()
+    )
+
+
+def get_shopping_cart_etag(shopping_cart, list_format):
+    """
+    Вспомогательная функция, возвращающая ETag списка покупок.
+
+    ETag вычисляется по рецептам корзины и времени их изменения
+    (Recipe.updated), которое меняется при правке рецепта, его
+    ингредиентов и самих ингредиентов. Поэтому ETag меняется при
+    добавлении и удалении рецептов из корзины и при изменении их
+    ингредиентов, а для проверки достаточно одного запроса по строкам
+    корзины без группировки ингредиентов.
+    """
+    digest = hashlib.md5(list_format.encode())
+    for recipe_id, updated in shopping_cart.order_by(
+        'recipe_id'
+    ).values_list('recipe_id', 'recipe__updated').iterator():
+        digest.update(f'{recipe_id}:{updated.isoformat()};'.encode())
+    return f'"{digest.hexdigest()}"'
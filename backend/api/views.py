@@ -1,7 +1,10 @@
-from django.shortcuts import get_object_or_404, HttpResponse
+from django.db.models import Count, Exists, OuterRef, Prefetch
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views import View
 from http import HTTPStatus
-import shortuuid
-from shortener.models import Url
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser import views as djoser_views
 from rest_framework import status, viewsets, mixins
@@ -14,25 +17,50 @@ from rest_framework.permissions import (
 )
 from rest_framework.response import Response
 from rest_framework.pagination import LimitOffsetPagination
-
-from .filters import RecipeFilter
+from rest_framework.parsers import JSONParser, MultiPartParser
+from rest_framework.renderers import JSONRenderer
+
+from .filters import (
+    INGREDIENT_SEARCH_LIMIT,
+    IngredientFilter,
+    RecipeFilter,
+    RecipeOrderingFilter
+)
 from users.models import User, Subscription
 from .utils import (
     create_model_instance,
+    create_model_instances,
     delete_model_instance,
-    create_shopping_list
+    delete_model_instances,
+    get_author_recipes,
+    get_recipes_limit,
+    get_shopping_cart_etag,
+    set_recipe_user_flags,
+    stream_shopping_list
 )
 from food.models import (
     Tag, Ingredient, Recipe, Favorite,
-    ShoppingCart
+    ShoppingCart, RecipeIngredient
 )
 from .serializers import (
     UserSerializer, AvatarSerializer, TagSerializer,
     IngredientSerializer, RecipeSerializer,
-    FavoriteSerializer, ShoppingCartSerializer,
+    FavoriteSerializer, ShoppingCartSerializer, RecipeIdsSerializer,
+    RecipeImageSerializer,
     RecipeCreateSerializer, SubscriptionSerializer, SubscribeSerializer
 )
+from .caching import (
+    CachedResponseMixin,
+    get_cached_data,
+    is_shared_cache
+)
+from .feed import get_feed_items, get_feed_queryset, get_feed_recipes
+from .pagination import RecipeFeedPagination, RecipePagination
 from .permissions import IsAuthorOrReadOnly
+from .parsers import ImageUploadParser, get_image_data
+from .renderers import PlainTextRenderer, CSVRenderer
+from .search import ingredient_index
+from .shortlinks import get_short_code, hit_counter, resolve_short_code
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
@@ -49,22 +77,94 @@ class RecipeViewSet(viewsets.ModelViewSet):
     Фильтрация: Для фильтрации рецептов используется класс RecipeFilter,
     который позволяет фильтровать по различным критериям.
 
+    Сортировка: параметр ordering по pub_date или favorites_count,
+    например ordering=-favorites_count (RecipeOrderingFilter).
+    Постраничная навигация по cursor всегда сортирует по (pub_date, id).
+
+    Пагинация: limit/offset или page, а с параметром cursor —
+    по ключу (pub_date, id) (RecipePagination).
+
     Методы HTTP: Поддерживаются методы GET, POST, PATCH и DELETE.
     """
     queryset = Recipe.objects.all()
     permission_classes = (IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly,)
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, RecipeOrderingFilter)
     filterset_class = RecipeFilter
+    ordering_fields = ('pub_date', 'favorites_count')
+    pagination_class = RecipePagination
     http_method_names = ('get', 'post', 'patch', 'delete')
 
     def get_queryset(self):
         """
         Переопределяет стандартный метод get_queryset,
-        чтобы предварительно загрузить связанные объекты ingredients и tags
-        для каждого рецепта. Это позволяет оптимизировать
-        количество запросов к базе данных.
+        чтобы загрузить автора вместе с рецептом, а ингредиенты рецепта
+        (вместе с самими ингредиентами) и теги — отдельными запросами
+        сразу для всей страницы. Число запросов не зависит
+        от количества рецептов и ингредиентов.
+
+        Для авторизованного пользователя флаги is_favorited и
+        is_in_shopping_cart вычисляются в том же запросе через EXISTS,
+        а не отдельным запросом на каждый рецепт.
         """
-        return Recipe.objects.prefetch_related('ingredients', 'tags').all()
+        queryset = Recipe.objects.select_related(
+            'author'
+        ).prefetch_related(
+            Prefetch(
+                'ingredient_in_recipe',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                )
+            ),
+            'tags'
+        )
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_favorited=Exists(
+                    Favorite.objects.filter(
+                        user=user,
+                        recipe=OuterRef('pk')
+                    )
+                ),
+                is_in_shopping_cart=Exists(
+                    ShoppingCart.objects.filter(
+                        user=user,
+                        recipe=OuterRef('pk')
+                    )
+                )
+            )
+        return queryset.all()
+
+    def list(self, request, *args, **kwargs):
+        """
+        Переопределяет стандартный метод list, чтобы брать страницу
+        списка рецептов из общего для всех пользователей кэша
+        и проставлять в ней флаги текущего пользователя.
+        Выборки избранного и списка покупок не кэшируются,
+        так как зависят от пользователя, а сортировка по ordering —
+        так как счетчики меняются без сброса кэша. Если кэш не общий
+        для процессов (LocMemCache), список не кэшируется вовсе:
+        изменение рецепта в одном процессе не сбросило бы кэш других.
+        """
+        if (
+            not is_shared_cache()
+            or 'is_favorited' in request.query_params
+            or 'is_in_shopping_cart' in request.query_params
+            or 'ordering' in request.query_params
+        ):
+            return super().list(request, *args, **kwargs)
+        data = get_cached_data(
+            'recipes',
+            request,
+            lambda: super(RecipeViewSet, self).list(
+                request, *args, **kwargs
+            ).data
+        )
+        set_recipe_user_flags(
+            data['results'] if isinstance(data, dict) else data,
+            self.get_serializer_context()
+        )
+        return Response(data)
 
     def perform_create(self, serializer):
         """Переопределяет стандартный метод perform_create,
@@ -78,6 +178,16 @@ class RecipeViewSet(viewsets.ModelViewSet):
         при обновлении рецепта."""
         serializer.save(author=self.request.user)
 
+    def get_serializer_context(self):
+        """
+        Возвращает контекст сериализаторов, общий для всего запроса:
+        подписки текущего пользователя, сохраненные в нем, загружаются
+        один раз и для страницы из кэша, и для флагов пользователя.
+        """
+        if not hasattr(self, '_serializer_context'):
+            self._serializer_context = super().get_serializer_context()
+        return self._serializer_context
+
     def get_serializer_class(self, *args, **kwargs):
         """
         Переопределяет стандартный метод get_serializer_class,
@@ -90,27 +200,75 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeSerializer
         return RecipeCreateSerializer
 
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        pagination_class=RecipeFeedPagination
+    )
+    def feed(self, request):
+        """
+        Данный метод возвращает ленту рецептов авторов, на которых
+        подписан текущий пользователь, от новых к старым.
+        Лента листается по курсору из ссылок next и previous.
+        Материализованная лента листается по записям FeedItem,
+        после чего рецепты страницы загружаются по id.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        feed_items = get_feed_items(request.user, queryset)
+        if feed_items is None:
+            page = self.paginate_queryset(
+                get_feed_queryset(request.user, queryset)
+            )
+        else:
+            self.paginator.cursor_fields = ('pub_date', 'recipe_id')
+            page = get_feed_recipes(
+                self.paginate_queryset(feed_items),
+                queryset
+            )
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=True,
+        methods=('put',),
+        http_method_names=('put',),
+        parser_classes=(JSONParser, MultiPartParser, ImageUploadParser)
+    )
+    def image(self, request, pk=None):
+        """
+        Заменяет изображение рецепта. Изображение принимается
+        в формате JSON (base64), как поле image в multipart/form-data
+        или телом запроса с заголовком Content-Type: image/<тип>.
+        """
+        recipe = self.get_object()
+        serializer = RecipeImageSerializer(
+            recipe,
+            data=get_image_data(request, 'image')
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(
+            RecipeSerializer(
+                recipe,
+                context=self.get_serializer_context()
+            ).data
+        )
+
     @action(
         detail=True,
         url_path='get-link',
     )
     def get_link(self, request, pk=None):
         """
-        Данный метод генерирует короткую ссылку
+        Данный метод возвращает короткую ссылку
         для конкретного рецепта. Он принимает запрос на GET и
-        возвращает короткую ссылку в формате JSON.
+        возвращает короткую ссылку в формате JSON. Код ссылки
+        вычисляется из идентификатора рецепта, поэтому ссылка
+        всегда одна и та же и ничего не записывается в базу данных.
         """
         recipe = self.get_object()
-        long_url = request.build_absolute_uri(
-            f'/recipes/{recipe.pk}/'
-        )
-        short_id = shortuuid.uuid()[:6]
-        short_url = Url.objects.create(
-            long_url=long_url,
-            short_id=short_id
-        )
         short_link = request.build_absolute_uri(
-            f'/s/{short_url.short_id}/'
+            reverse('short-link', args=(get_short_code(recipe.pk),))
         )
         return Response(
             {'short-link': short_link},
@@ -170,35 +328,84 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 recipe
             )
 
+    def bulk_change(self, request, model_name):
+        """
+        Добавляет рецепты из списка recipes в избранное или список покупок
+        (POST) либо удаляет их оттуда (DELETE). Возвращает результат
+        для каждого id рецепта.
+        """
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        if request.method == 'POST':
+            return create_model_instances(request, recipe_ids, model_name)
+        return delete_model_instances(request, recipe_ids, model_name)
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        permission_classes=(IsAuthenticated,),
+        url_path='favorite'
+    )
+    def bulk_favorite(self, request):
+        """
+        Данный метод позволяет добавить в избранное или удалить из него
+        сразу несколько рецептов одним запросом.
+        """
+        return self.bulk_change(request, Favorite)
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        permission_classes=(IsAuthenticated,),
+        url_path='shopping_cart'
+    )
+    def bulk_shopping_cart(self, request):
+        """
+        Данный метод позволяет добавить в список покупок или удалить
+        из него сразу несколько рецептов одним запросом.
+        """
+        return self.bulk_change(request, ShoppingCart)
+
     @action(
         detail=False,
         permission_classes=(AllowAny,),
+        renderer_classes=(PlainTextRenderer, CSVRenderer, JSONRenderer),
     )
     def download_shopping_cart(self, request):
         """
-        Данный метод позволяет пользователям скачать текстовый файл
+        Данный метод позволяет пользователям скачать файл
         со списком ингредиентов, необходимых для рецептов, добавленных
         в список покупок. Метод поддерживает только GET запросы.
-        """
 
-        user_id = self.request.user.id
+        Формат файла выбирается параметром format (txt, csv или json),
+        по умолчанию txt. Файл отдается потоково, а при неизменной
+        корзине повторный запрос получает ответ 304.
+        """
+        list_format = request.accepted_renderer.format
         shopping_cart_items = ShoppingCart.objects.filter(
-            user=user_id
-        )
-        buy_list_text = create_shopping_list(
-            shopping_cart_items
-        )
-        response = HttpResponse(
-            buy_list_text,
-            content_type="text/plain"
-        )
-        response['Content-Disposition'] = (
-            'attachment; filename=shopping_list_ingredients.txt'
+            user=self.request.user.id
         )
+        etag = get_shopping_cart_etag(shopping_cart_items, list_format)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = StreamingHttpResponse(
+                stream_shopping_list(shopping_cart_items, list_format),
+                content_type=(
+                    f'{request.accepted_renderer.media_type}; charset=utf-8'
+                )
+            )
+            response['Content-Disposition'] = (
+                'attachment; filename='
+                f'shopping_list_ingredients.{list_format}'
+            )
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
         return response
 
 
 class IngredientViewSet(
+    CachedResponseMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     viewsets.GenericViewSet
@@ -215,14 +422,40 @@ class IngredientViewSet(
     - Применяется сериализатор IngredientSerializer
     - Отключена постраничная навигация (pagination_class = None)
     - Доступ разрешен для всех пользователей (permission_classes = (AllowAny,))
+    - Поиск по началу и вхождению в название (параметр name),
+      число результатов поиска ограничено
+    - Поиск выполняется по индексу в памяти процесса (ingredient_index),
+      фильтр IngredientFilter используется, если индекс отключен
+    - Ответы кэшируются и содержат ETag (CachedResponseMixin)
     """
+    cache_prefix = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
     permission_classes = (AllowAny,)
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = IngredientFilter
+    use_ingredient_index = True
+
+    def list(self, request, *args, **kwargs):
+        """
+        Возвращает список ингредиентов. При поиске по названию
+        ингредиенты берутся из индекса без обращения к базе данных.
+        """
+        name = request.query_params.get('name')
+        if not name or not self.use_ingredient_index:
+            return super().list(request, *args, **kwargs)
+        return self.get_cached_response(
+            request,
+            lambda: self.get_serializer(
+                ingredient_index.search(name, INGREDIENT_SEARCH_LIMIT),
+                many=True
+            ).data
+        )
 
 
 class TagViewSet(
+    CachedResponseMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     viewsets.GenericViewSet
@@ -239,7 +472,9 @@ class TagViewSet(
     - Применяется сериализатор TagSerializer
     - Отключена постраничная навигация (pagination_class = None)
     - Доступ разрешен для всех пользователей (permission_classes = (AllowAny,))
+    - Ответы кэшируются и содержат ETag (CachedResponseMixin)
     """
+    cache_prefix = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
@@ -286,14 +521,17 @@ class UserViewSet(djoser_views.UserViewSet):
     @action(
         methods=('put', 'delete'),
         detail=False,
-        url_path='me/avatar'
+        url_path='me/avatar',
+        parser_classes=(JSONParser, MultiPartParser, ImageUploadParser)
     )
     def avatar(self, request):
         """
         Обновить или удалить аватар текущего пользователя.
 
-        Принимает данные аватара в формате JSON и обновляет аватар текущего
-        пользователя. Если передается метод DELETE, то аватар удаляется.
+        Принимает аватар в формате JSON (base64), как поле avatar
+        в multipart/form-data или телом запроса с заголовком
+        Content-Type: image/<тип> и обновляет аватар текущего пользователя.
+        Если передается метод DELETE, то аватар удаляется.
         """
         user = request.user
         if not user.is_authenticated:
@@ -301,13 +539,18 @@ class UserViewSet(djoser_views.UserViewSet):
                 {'detail': 'Учетные данные аутентификации не предоставлены.'},
                 status=status.HTTP_401_UNAUTHORIZED
             )
-        serializer = AvatarSerializer(data=request.data)
         if request.method == 'PUT':
+            serializer = AvatarSerializer(
+                data=get_image_data(request, 'avatar')
+            )
             if serializer.is_valid():
                 user.avatar = serializer.validated_data['avatar']
                 user.save()
                 return Response(
-                    {"avatar": "http://sashamyhost.zapto.org/user.avatar.url"},
+                    {
+                        'avatar': request.build_absolute_uri(user.avatar.url)
+                        if user.avatar else None
+                    },
                     status=status.HTTP_200_OK
                 )
             else:
@@ -334,7 +577,9 @@ class UserViewSet(djoser_views.UserViewSet):
 
         Возвращает список пользователей,
         на которых подписан текущий пользователь,
-        с использованием пагинации.
+        с использованием пагинации. Количество рецептов
+        аннотируется, а не больше recipes_limit рецептов каждого
+        автора загружаются одним запросом.
         """
 
         user = request.user
@@ -343,7 +588,14 @@ class UserViewSet(djoser_views.UserViewSet):
             'author_id',
             flat=True
         )
-        users = User.objects.filter(id__in=users_id)
+        users = User.objects.filter(id__in=users_id).annotate(
+            recipes_count=Count('recipes')
+        ).prefetch_related(
+            Prefetch(
+                'recipes',
+                queryset=get_author_recipes(get_recipes_limit(request))
+            )
+        ).order_by('username')
         paginated_queryset = self.paginate_queryset(users)
         serializer = self.serializer_class(
             paginated_queryset,
@@ -393,3 +645,22 @@ class UserViewSet(djoser_views.UserViewSet):
             return Response(
                 status=status.HTTP_204_NO_CONTENT
             )
+
+
+class ShortLinkRedirectView(View):
+    """
+    Перенаправляет по короткой ссылке на страницу рецепта
+    и учитывает переход в счетчике рецепта.
+
+    Идентификатор рецепта декодируется из кода ссылки, к базе
+    данных обращается только первый переход на рецепт и первый
+    переход по прежней случайной ссылке; переходы записываются
+    в базу пакетами. Коды рецептов, которых нет, дают ответ 404.
+    """
+
+    def get(self, request, code):
+        recipe_id = resolve_short_code(code)
+        if recipe_id is None:
+            raise Http404('Короткая ссылка не найдена.')
+        hit_counter.add(recipe_id)
+        return redirect(f'/recipes/{recipe_id}/')
@@ -69,8 +69,22 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
+    }
+}
+
 AUTH_USER_MODEL = 'users.User'
 
+FEED_FANOUT_MIN_SUBSCRIPTIONS = int(
+    os.getenv('FEED_FANOUT_MIN_SUBSCRIPTIONS', 0)
+)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -103,6 +117,16 @@ STATIC_ROOT = BASE_DIR / 'backend_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+DEFAULT_FILE_STORAGE = 'api.storage.ContentHashStorage'
+
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+
+MAX_IMAGE_SIZE = int(os.getenv('MAX_IMAGE_SIZE', 10 * 1024 * 1024))
+
+SHORT_LINK_CACHE_SIZE = int(os.getenv('SHORT_LINK_CACHE_SIZE', 10000))
+
+SHORT_LINK_FLUSH_INTERVAL = int(os.getenv('SHORT_LINK_FLUSH_INTERVAL', 30))
+
 ROOT_URLCONF = 'config.urls'
 
 
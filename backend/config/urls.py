@@ -3,10 +3,16 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
+from api.views import ShortLinkRedirectView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
-    path('s/', include('shortener.urls', namespace='shortener')),
+    path(
+        's/<slug:code>/',
+        ShortLinkRedirectView.as_view(),
+        name='short-link'
+    ),
 ]
 
 if settings.DEBUG:
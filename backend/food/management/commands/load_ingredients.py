@@ -0,0 +1,163 @@
+import csv
+import io
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.caching import invalidate_cache
+from api.search import ingredient_index
+from food.models import Ingredient, normalize_name
+
+DEFAULT_PATH = settings.BASE_DIR.parent / 'data' / 'ingredients.csv'
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    """Построчно читает ингредиенты из CSV-файла без заголовка."""
+    for row in csv.reader(file):
+        if row:
+            yield row[0], row[1]
+
+
+def read_json(file):
+    """
+    Читает ингредиенты из JSON-массива по частям, не загружая
+    весь файл в память.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,[]':
+            position += 1
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                if buffer[position:].strip():
+                    raise CommandError('Некорректный JSON-файл')
+                return
+            chunk = file.read(READ_CHUNK_SIZE)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item['name'], item['measurement_unit']
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
+class Command(BaseCommand):
+    """Загружает ингредиенты из CSV- или JSON-файла."""
+    help = 'Загружает ингредиенты из файла data/ingredients.csv или .json'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=DEFAULT_PATH,
+            type=Path,
+            help='Путь к файлу с ингредиентами (.csv или .json)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Количество строк, записываемых за один запрос'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        reader = READERS.get(path.suffix.lower())
+        if reader is None:
+            raise CommandError('Поддерживаются только файлы .csv и .json')
+        if not path.exists():
+            raise CommandError(f'Файл {path} не найден')
+
+        started = time.perf_counter()
+        count_before = Ingredient.objects.count()
+        with open(path, encoding='utf-8') as file, transaction.atomic():
+            rows = reader(file)
+            if connection.vendor == 'postgresql':
+                processed = self.copy_rows(rows, options['batch_size'])
+            else:
+                processed = self.bulk_create_rows(rows, options['batch_size'])
+        added = Ingredient.objects.count() - count_before
+        # Пакетная загрузка не отправляет сигналы моделей, поэтому
+        # кэш ответов и индекс ингредиентов сбрасываются здесь.
+        ingredient_index.invalidate()
+        invalidate_cache('ingredients')
+        invalidate_cache('recipes')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {processed}, добавлено: {added}, '
+            f'время: {elapsed:.2f} с, '
+            f'{processed / elapsed if elapsed else processed:.0f} строк/с'
+        ))
+
+    def bulk_create_rows(self, rows, batch_size):
+        """Записывает строки пачками, пропуская уже существующие."""
+        processed = 0
+        while True:
+            batch = [
+                Ingredient(
+                    name=name,
+                    measurement_unit=measurement_unit,
+                    search_name=normalize_name(name)
+                )
+                for name, measurement_unit in islice(rows, batch_size)
+            ]
+            if not batch:
+                return processed
+            Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+            processed += len(batch)
+
+    def copy_rows(self, rows, batch_size):
+        """
+        Загружает строки во временную таблицу командой COPY
+        и переносит их в таблицу ингредиентов, пропуская
+        нарушения ограничения unique_ingredient.
+        """
+        table = Ingredient._meta.db_table
+        processed = 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE ingredient_import '
+                '(name varchar(128), measurement_unit varchar(64), '
+                'search_name varchar(128)) '
+                'ON COMMIT DROP'
+            )
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(
+                    (name, measurement_unit, normalize_name(name))
+                    for name, measurement_unit in batch
+                )
+                buffer.seek(0)
+                cursor.copy_expert(
+                    'COPY ingredient_import '
+                    '(name, measurement_unit, search_name) '
+                    'FROM STDIN WITH (FORMAT csv)',
+                    buffer
+                )
+                processed += len(batch)
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit, search_name) '
+                'SELECT DISTINCT name, measurement_unit, search_name '
+                'FROM ingredient_import '
+                'ON CONFLICT ON CONSTRAINT unique_ingredient DO NOTHING'
+            )
+        return processed
@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from food.models import Favorite, Recipe, ShoppingCart
+
+COUNTERS = (
+    ('favorites_count', Favorite),
+    ('cart_count', ShoppingCart),
+)
+
+
+def get_actual_count(model):
+    """Возвращает подзапрос с числом записей model для рецепта."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                recipe=OuterRef('pk')
+            ).order_by().values('recipe').annotate(
+                count=Count('id')
+            ).values('count')
+        ),
+        0
+    )
+
+
+class Command(BaseCommand):
+    """
+    Исправляет расхождения счетчиков favorites_count и cart_count
+    рецептов с фактическим числом записей избранного и списков покупок.
+
+    Рецепты обрабатываются пачками по id, каждая пачка — в отдельной
+    транзакции. Обновляются только рецепты с неверными счетчиками,
+    и новые значения вычисляются в том же запросе UPDATE.
+    """
+    help = 'Пересчитывает счетчики избранного и списков покупок рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество рецептов, проверяемых за один запрос'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        actual = {
+            counter: get_actual_count(model) for counter, model in COUNTERS
+        }
+        drift = Q()
+        for counter, _ in COUNTERS:
+            drift |= ~Q(**{counter: F(f'actual_{counter}')})
+        checked = fixed = 0
+        last_id = 0
+        while True:
+            batch = list(
+                Recipe.objects.filter(
+                    id__gt=last_id
+                ).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1]
+            checked += len(batch)
+            with transaction.atomic():
+                drifted = list(
+                    Recipe.objects.filter(id__in=batch).annotate(
+                        **{
+                            f'actual_{counter}': expression
+                            for counter, expression in actual.items()
+                        }
+                    ).filter(drift).values_list('id', flat=True)
+                )
+                if drifted:
+                    fixed += Recipe.objects.filter(
+                        id__in=drifted
+                    ).update(**actual)
+        self.stdout.write(
+            f'Проверено рецептов: {checked}, исправлено: {fixed}'
+        )
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.3 on 2026-10-18 04:34
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+def create_trigram_index(apps, schema_editor):
+    """Создает триграммный индекс по названию ингредиента в PostgreSQL."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS ingredient_name_trgm_idx '
+        'ON food_ingredient USING gin (LOWER(name) gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    """Удаляет триграммный индекс по названию ингредиента."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS ingredient_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='ingredient_name_lower_idx'),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
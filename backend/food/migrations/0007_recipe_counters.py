@@ -0,0 +1,51 @@
+# Generated by Django 3.2.3 on 2026-10-18 04:47
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_recipe_counters(apps, schema_editor):
+    """Заполняет счетчики рецептов по существующим записям."""
+    Recipe = apps.get_model('food', 'Recipe')
+    counters = {}
+    for field, model_name in (
+        ('favorites_count', 'Favorite'),
+        ('cart_count', 'ShoppingCart'),
+    ):
+        counters[field] = Coalesce(
+            Subquery(
+                apps.get_model('food', model_name).objects.filter(
+                    recipe=OuterRef('pk')
+                ).order_by().values('recipe').annotate(
+                    count=Count('id')
+                ).values('count')
+            ),
+            0
+        )
+    Recipe.objects.update(**counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0006_recipeingredient_recipe_ingredient_amount_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='cart_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлений в список покупок'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлений в избранное'),
+        ),
+        migrations.RunPython(fill_recipe_counters, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['favorites_count', 'id'], name='recipe_favorites_count_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-18 04:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0007_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='short_link_hits',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Переходов по короткой ссылке'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+from django.db import migrations, models
+
+FILL_BATCH_SIZE = 1000
+
+
+def normalize_name(value):
+    return value.casefold().replace('ё', 'е')
+
+
+def fill_search_names(apps, schema_editor):
+    """Заполняет search_name существующих ингредиентов."""
+    Ingredient = apps.get_model('food', 'Ingredient')
+    batch = []
+    for ingredient in Ingredient.objects.only('id', 'name').iterator():
+        ingredient.search_name = normalize_name(ingredient.name)
+        batch.append(ingredient)
+        if len(batch) >= FILL_BATCH_SIZE:
+            Ingredient.objects.bulk_update(batch, ['search_name'])
+            batch = []
+    Ingredient.objects.bulk_update(batch, ['search_name'])
+
+
+def move_trigram_index(apps, schema_editor):
+    """Переносит триграммный индекс PostgreSQL на search_name."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS ingredient_name_trgm_idx')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS ingredient_search_name_trgm_idx '
+        'ON food_ingredient USING gin (search_name gin_trgm_ops)'
+    )
+
+
+def restore_trigram_index(apps, schema_editor):
+    """Возвращает триграммный индекс PostgreSQL по LOWER(name)."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'DROP INDEX IF EXISTS ingredient_search_name_trgm_idx'
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS ingredient_name_trgm_idx '
+        'ON food_ingredient USING gin (LOWER(name) gin_trgm_ops)'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0009_recipe_updated'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='ingredient_name_lower_idx',
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='search_name',
+            field=models.CharField(default='', editable=False, max_length=128, verbose_name='Название для поиска'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_search_names, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='ingredient',
+            name='search_name',
+            field=models.CharField(db_index=True, editable=False, max_length=128, verbose_name='Название для поиска'),
+        ),
+        migrations.RunPython(move_trigram_index, restore_trigram_index),
+    ]
@@ -8,6 +8,11 @@ TEXT_LENGTH_LIMIT = 20
 MIN_COOK_TIME = 1
 
 
+def normalize_name(value):
+    """Приводит название к виду для поиска: без регистра и с 'е' вместо 'ё'."""
+    return value.casefold().replace('ё', 'е')
+
+
 class Tag(models.Model):
     """Модель тега."""
     name = models.CharField(
@@ -31,7 +36,14 @@ class Tag(models.Model):
 
 
 class Ingredient(models.Model):
-    """Модель ингредиента."""
+    """
+    Модель ингредиента.
+
+    Поле search_name хранит название, приведенное функцией
+    normalize_name, и заполняется при сохранении. Поиск идет по нему,
+    а не по LOWER(name) в базе данных, так как LOWER в SQLite
+    не меняет регистр кириллицы.
+    """
     name = models.CharField(
         'Название ингредиента',
         help_text='Названия ингридинтов для блюда',
@@ -42,6 +54,12 @@ class Ingredient(models.Model):
         help_text='Применяйте наиболее подходящую единицу измерения',
         max_length=64,
     )
+    search_name = models.CharField(
+        'Название для поиска',
+        max_length=128,
+        db_index=True,
+        editable=False
+    )
 
     class Meta:
         ordering = ['name']
@@ -57,9 +75,29 @@ class Ingredient(models.Model):
     def __str__(self):
         return self.name[:TEXT_LENGTH_LIMIT]
 
+    def save(self, *args, **kwargs):
+        self.search_name = normalize_name(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'search_name'}
+        super().save(*args, **kwargs)
+
 
 class Recipe(models.Model):
-    """Модель рецепта."""
+    """
+    Модель рецепта.
+
+    Поля favorites_count и cart_count хранят число добавлений рецепта
+    в избранное и в списки покупок. Они обновляются вместе с записями
+    Favorite и ShoppingCart, а расхождения исправляет команда
+    reconcile_counters. Поле short_link_hits хранит число переходов
+    по короткой ссылке на рецепт; переходы накапливаются в памяти
+    процесса и записываются пакетами (api.shortlinks). Поле updated
+    меняется при каждом изменении рецепта и его ингредиентов;
+    по нему строится ETag списка покупок. Поле image_variants_source
+    хранит имя изображения, для которого созданы уменьшенные копии:
+    копии текущего изображения готовы, если оно совпадает с image.
+    """
     author = models.ForeignKey(
         User,
         verbose_name='Автор рецепта',
@@ -78,6 +116,12 @@ class Recipe(models.Model):
         null=True,
         default=None
     )
+    image_variants_source = models.CharField(
+        'Изображение с готовыми копиями',
+        max_length=100,
+        blank=True,
+        editable=False
+    )
     text = models.TextField(
         'Описание',
         help_text='Описание и инструкция по приготовлению блюда'
@@ -110,11 +154,40 @@ class Recipe(models.Model):
         auto_now_add=True,
         db_index=True,
     )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
+    favorites_count = models.PositiveIntegerField(
+        'Добавлений в избранное',
+        default=0,
+        editable=False
+    )
+    cart_count = models.PositiveIntegerField(
+        'Добавлений в список покупок',
+        default=0,
+        editable=False
+    )
+    short_link_hits = models.PositiveIntegerField(
+        'Переходов по короткой ссылке',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='recipe_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['favorites_count', 'id'],
+                name='recipe_favorites_count_idx',
+            )
+        ]
 
     def __str__(self):
         return f'{self.name}\n{self.text[:TEXT_LENGTH_LIMIT]}'
@@ -151,7 +224,13 @@ class Favorite(models.Model):
 
 
 class RecipeIngredient(models.Model):
-    """Модель ингредиентов для рецепта."""
+    """
+    Модель ингредиентов для рецепта.
+
+    Индекс (recipe, ingredient, amount) покрывает выборку ингредиентов
+    рецептов страницы и суммирование количеств для списка покупок:
+    строки находятся и читаются по индексу, без обращения к таблице.
+    """
     recipe = models.ForeignKey(
         Recipe,
         related_name='ingredient_in_recipe',
@@ -170,6 +249,12 @@ class RecipeIngredient(models.Model):
     )
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=['recipe', 'ingredient', 'amount'],
+                name='recipe_ingredient_amount_idx',
+            )
+        ]
         verbose_name = 'Ингредиенты рецепта'
         verbose_name_plural = 'Ингредиенты рецептов'
 
@@ -206,3 +291,45 @@ class ShoppingCart(models.Model):
     def __str__(self):
         return (f'{self.user.username} добавил'
                 f'{self.recipe.name} в список покупок')
+
+
+class FeedItem(models.Model):
+    """
+    Модель записи материализованной ленты подписок пользователя.
+    Заполняется только для пользователей с большим числом подписок.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Пользователь'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Рецепт'
+    )
+    pub_date = models.DateTimeField(
+        'Дата публикации рецепта'
+    )
+
+    class Meta:
+        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_user_recipe_feed'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_user_pub_date_recipe_idx',
+            )
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+
+    def __str__(self):
+        return f'{self.recipe.name} в ленте {self.user.username}'
@@ -0,0 +1,117 @@
+# Generated by Django 3.2.3 on 2026-10-18 04:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def delete_incomplete_subscriptions(apps, schema_editor):
+    """Удаляет подписки без пользователя или автора."""
+    Subscription = apps.get_model('users', 'Subscription')
+    Subscription.objects.filter(
+        models.Q(user=None) | models.Q(author=None)
+    ).delete()
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """
+    Добавляет индекс; в PostgreSQL — без блокировки записи
+    в таблицу (CREATE INDEX CONCURRENTLY).
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = to_state.apps.get_model(app_label, self.model_name)
+        schema_editor.add_index(model, self.index, concurrently=True)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = from_state.apps.get_model(app_label, self.model_name)
+        schema_editor.remove_index(model, self.index, concurrently=True)
+
+
+class DropForeignKeyUniqueness(migrations.AlterField):
+    """
+    Снимает уникальность с внешнего ключа. В PostgreSQL удаляется
+    только ограничение уникальности, а внешний ключ не пересоздается,
+    поэтому таблица не блокируется на время проверки ссылок.
+    """
+
+    def get_unique_constraints(self, schema_editor, model):
+        column = model._meta.get_field(self.name).column
+        with schema_editor.connection.cursor() as cursor:
+            constraints = (
+                schema_editor.connection.introspection.get_constraints(
+                    cursor, model._meta.db_table
+                )
+            )
+        return column, [
+            name for name, info in constraints.items()
+            if info['unique'] and not info['primary_key']
+            and info['columns'] == [column]
+        ]
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = from_state.apps.get_model(app_label, self.model_name)
+        _, names = self.get_unique_constraints(schema_editor, model)
+        for name in names:
+            schema_editor.execute(
+                f'ALTER TABLE {model._meta.db_table} DROP CONSTRAINT {name}'
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = to_state.apps.get_model(app_label, self.model_name)
+        column, _ = self.get_unique_constraints(schema_editor, model)
+        table = model._meta.db_table
+        schema_editor.execute(
+            f'ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_key '
+            f'UNIQUE ({column})'
+        )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            delete_incomplete_subscriptions,
+            migrations.RunPython.noop
+        ),
+        AddIndexConcurrently(
+            model_name='subscription',
+            index=models.Index(fields=['author', 'user'], name='subscription_author_user_idx'),
+        ),
+        DropForeignKeyUniqueness(
+            model_name='subscription',
+            name='author',
+            field=models.ForeignKey(db_index=False, help_text='Подписаться на автора рецепта', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='following', to=settings.AUTH_USER_MODEL, verbose_name='Подписка'),
+        ),
+        DropForeignKeyUniqueness(
+            model_name='subscription',
+            name='user',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='follower', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+    ]
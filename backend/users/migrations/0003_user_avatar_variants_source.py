@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_auto_20261018_0441'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_variants_source',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Аватар с готовыми копиями'),
+        ),
+    ]
@@ -10,6 +10,8 @@ class User(AbstractUser):
     """
     Модель пользователя.
     Регистрация с помощью email.
+    Поле avatar_variants_source хранит имя аватара, для которого
+    созданы уменьшенные копии.
     """
     email = models.EmailField(
         'email-адрес',
@@ -43,6 +45,12 @@ class User(AbstractUser):
         blank=True,
         default=None
     )
+    avatar_variants_source = models.CharField(
+        'Аватар с готовыми копиями',
+        max_length=100,
+        blank=True,
+        editable=False
+    )
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name')
 
@@ -55,18 +63,25 @@ class User(AbstractUser):
 
 
 class Subscription(models.Model):
-    """Модель подписок пользователя."""
+    """
+    Модель подписок пользователя.
+
+    Уникальна пара (user, author). Подписки пользователя ищутся
+    по индексу ограничения unique_following, подписчики автора —
+    по индексу subscription_author_user_idx, поэтому отдельные
+    индексы по внешним ключам не создаются.
+    """
     user = models.ForeignKey(
         User,
         null=True,
-        unique=True,
+        db_index=False,
         on_delete=models.CASCADE,
         related_name='follower',
         verbose_name='Пользователь')
     author = models.ForeignKey(
         User,
         null=True,
-        unique=True,
+        db_index=False,
         verbose_name='Подписка',
         related_name='following',
         on_delete=models.CASCADE,
@@ -79,6 +94,10 @@ class Subscription(models.Model):
             models.UniqueConstraint(fields=['user', 'author'],
                                     name='unique_following')
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='subscription_author_user_idx')
+        ]
 
     def __str__(self):
         return (f'{self.user[:TEXT_LENGTH_LIMIT]}'
@@ -0,0 +1,99 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from food.models import (
+    Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart, Tag
+)
+from users.models import Subscription, User
+
+RECIPES_COUNT = 500
+INGREDIENTS_PER_RECIPE = 5
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Очищает кэш ответов перед каждым тестом."""
+    cache.clear()
+
+
+@pytest.fixture
+def user(django_user_model):
+    return django_user_model.objects.create_user(
+        email='user@example.com',
+        username='user',
+        first_name='Иван',
+        last_name='Иванов',
+        password='password12345'
+    )
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def recipes(user):
+    """
+    Создает RECIPES_COUNT рецептов нескольких авторов с тегами
+    и ингредиентами; часть рецептов добавлена пользователем user
+    в избранное и список покупок, на одного автора он подписан.
+    """
+    User.objects.bulk_create(
+        User(
+            email=f'author{number}@example.com',
+            username=f'author{number}',
+            first_name='Автор',
+            last_name=str(number)
+        )
+        for number in range(3)
+    )
+    authors = list(
+        User.objects.filter(username__startswith='author').order_by('id')
+    )
+    Tag.objects.bulk_create(
+        Tag(name=f'Тег {number}', slug=f'tag{number}')
+        for number in range(3)
+    )
+    tags = list(Tag.objects.order_by('id'))
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+        for number in range(INGREDIENTS_PER_RECIPE * 2)
+    )
+    ingredients = list(Ingredient.objects.order_by('id'))
+    Recipe.objects.bulk_create(
+        Recipe(
+            author=authors[number % len(authors)],
+            name=f'Рецепт {number}',
+            image='recipes/image.png',
+            text='Описание',
+            cooking_time=10
+        )
+        for number in range(RECIPES_COUNT)
+    )
+    recipes = list(Recipe.objects.order_by('id'))
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe=recipe, tag=tag)
+        for recipe in recipes
+        for tag in tags[:1 + recipe.id % len(tags)]
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(
+            recipe=recipe,
+            ingredient=ingredients[(recipe.id + number) % len(ingredients)],
+            amount=number + 1
+        )
+        for recipe in recipes
+        for number in range(INGREDIENTS_PER_RECIPE)
+    )
+    Favorite.objects.bulk_create(
+        Favorite(user=user, recipe=recipe) for recipe in recipes[::2]
+    )
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=user, recipe=recipe) for recipe in recipes[::3]
+    )
+    Subscription.objects.create(user=user, author=authors[0])
+    return recipes
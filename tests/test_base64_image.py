@@ -0,0 +1,103 @@
+import base64
+import io
+
+import pytest
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from api import images
+from api.images import decode_base64_image, is_base64_image
+from api.serializers import Base64ImageField
+
+MAX_SIZE = 1024 * 1024
+
+
+def make_png():
+    buffer = io.BytesIO()
+    Image.new('RGB', (16, 16), 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def to_data_url(content, content_type='image/png'):
+    return (
+        f'data:{content_type};base64,{base64.b64encode(content).decode()}'
+    )
+
+
+def read(file):
+    try:
+        return file.read()
+    finally:
+        file.close()
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    """Делит строку на части, длина которых не кратна четырем."""
+    monkeypatch.setattr(images, 'BASE64_CHUNK_SIZE', 7)
+
+
+def test_is_base64_image():
+    assert is_base64_image(to_data_url(b'data'))
+    assert not is_base64_image('image/png;base64,ZGF0YQ==')
+    assert not is_base64_image(b'data:image/png;base64,ZGF0YQ==')
+
+
+@pytest.mark.parametrize('length', range(1, 13))
+def test_decode_carries_partial_quads_between_chunks(small_chunks, length):
+    content = bytes(range(length))
+    file = decode_base64_image(to_data_url(content), MAX_SIZE)
+    assert file.size == length
+    assert read(file) == content
+
+
+def test_decode_ignores_whitespace_across_chunks(small_chunks):
+    content = make_png()
+    encoded = base64.b64encode(content).decode()
+    wrapped = '\n'.join(
+        encoded[start:start + 5] for start in range(0, len(encoded), 5)
+    )
+    file = decode_base64_image(f'data:image/png;base64,{wrapped}', MAX_SIZE)
+    assert read(file) == content
+
+
+@pytest.mark.parametrize('payload', ('QUJD', 'QUI=', 'QQ=='))
+def test_decode_accepts_padding_in_last_chunk(small_chunks, payload):
+    file = decode_base64_image(f'data:image/png;base64,{payload}', MAX_SIZE)
+    assert read(file) == base64.b64decode(payload)
+
+
+@pytest.mark.parametrize('payload', ('QUI', 'QQ', 'QUJDR', 'QQ='))
+def test_decode_rejects_invalid_data(small_chunks, payload):
+    with pytest.raises(ValidationError):
+        decode_base64_image(f'data:image/png;base64,{payload}', MAX_SIZE)
+
+
+def test_decode_rejects_unsupported_type():
+    with pytest.raises(ValidationError):
+        decode_base64_image(to_data_url(b'data', 'image/svg+xml'), MAX_SIZE)
+
+
+@pytest.mark.parametrize('size', (MAX_SIZE - 1, MAX_SIZE))
+def test_decode_accepts_image_of_max_size(size):
+    file = decode_base64_image(to_data_url(bytes(size)), size)
+    assert file.size == size
+    file.close()
+
+
+@pytest.mark.parametrize('size', (MAX_SIZE - 1, MAX_SIZE))
+def test_decode_rejects_image_over_max_size(size):
+    with pytest.raises(ValidationError):
+        decode_base64_image(to_data_url(bytes(size + 1)), size)
+
+
+def test_field_accepts_base64_image(small_chunks):
+    file = Base64ImageField().to_internal_value(to_data_url(make_png()))
+    assert file.name.endswith('.png')
+    assert read(file) == make_png()
+
+
+def test_field_rejects_image_over_max_size(settings):
+    settings.MAX_IMAGE_SIZE = 16
+    with pytest.raises(ValidationError):
+        Base64ImageField().to_internal_value(to_data_url(make_png()))
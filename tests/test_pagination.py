@@ -0,0 +1,89 @@
+from base64 import b64encode
+
+import pytest
+from rest_framework.test import APIClient
+
+from api.feed import fill_feed
+from food.models import Recipe
+
+LIST_URL = '/api/recipes/'
+FEED_URL = '/api/recipes/feed/'
+LIMIT = 50
+
+
+def encode(cursor):
+    return b64encode(cursor.encode()).decode()
+
+
+def walk(client, url, params):
+    """Проходит все страницы по ссылкам next и возвращает id рецептов."""
+    response = client.get(url, params)
+    ids = []
+    while True:
+        assert response.status_code == 200
+        ids += [recipe['id'] for recipe in response.data['results']]
+        if response.data['next'] is None:
+            return ids
+        response = client.get(response.data['next'])
+
+
+@pytest.mark.django_db
+def test_cursor_walk_returns_every_recipe_once(recipes):
+    ids = walk(APIClient(), LIST_URL, {'cursor': '', 'limit': LIMIT})
+    assert ids == list(
+        Recipe.objects.order_by('-pub_date', '-id').values_list(
+            'id', flat=True
+        )
+    )
+
+
+@pytest.mark.django_db
+def test_previous_link_returns_previous_page(recipes):
+    client = APIClient()
+    first = client.get(LIST_URL, {'cursor': '', 'limit': LIMIT}).data
+    second = client.get(first['next']).data
+    assert first['previous'] is None
+    assert client.get(second['previous']).data['results'] == (
+        first['results']
+    )
+
+
+@pytest.mark.django_db
+def test_cursor_count_only_on_request(recipes):
+    client = APIClient()
+    params = {'cursor': '', 'limit': LIMIT}
+    assert 'count' not in client.get(LIST_URL, params).data
+    params['count'] = 1
+    assert client.get(LIST_URL, params).data['count'] == len(recipes)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('cursor', (
+    'not base64!',
+    'Zg',
+    encode('f|2024-01-01T00:00:00+00:00'),
+    encode('f|2024-01-01T00:00:00+00:00|1|2'),
+    encode('f|not a date|1'),
+    encode('f|2024-01-01T00:00:00+00:00|id'),
+    b64encode(b'\xff\xfe|\xff').decode(),
+))
+def test_malformed_cursor_returns_not_found(recipes, cursor):
+    response = APIClient().get(LIST_URL, {'cursor': cursor})
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_materialized_feed_walk_matches_subscriptions(
+    recipes, user, user_client, settings
+):
+    params = {'limit': LIMIT}
+    expected = walk(user_client, FEED_URL, params)
+    assert len(expected) > LIMIT
+    settings.FEED_FANOUT_MIN_SUBSCRIPTIONS = 1
+    fill_feed(user.id)
+    assert walk(user_client, FEED_URL, params) == expected
+    assert expected == list(
+        Recipe.objects.filter(
+            author__following__user=user
+        ).order_by('-pub_date', '-id').values_list('id', flat=True)
+    )
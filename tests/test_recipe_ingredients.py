@@ -0,0 +1,116 @@
+import pytest
+
+from api.serializers import RecipeCreateSerializer
+from food.models import Ingredient, Recipe, RecipeIngredient, Tag
+
+
+@pytest.fixture
+def ingredients():
+    return [
+        Ingredient.objects.create(
+            name=f'Ингредиент {number}', measurement_unit='г'
+        )
+        for number in range(4)
+    ]
+
+
+@pytest.fixture
+def recipe(user, ingredients):
+    """Рецепт пользователя user с первыми тремя ингредиентами."""
+    recipe = Recipe.objects.create(
+        author=user,
+        name='Рецепт',
+        image='recipes/image.png',
+        text='Описание',
+        cooking_time=10
+    )
+    recipe.tags.add(Tag.objects.create(name='Завтрак', slug='breakfast'))
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+        for ingredient in ingredients[:3]
+    )
+    return recipe
+
+
+def get_rows(recipe):
+    """Возвращает записи ингредиентов рецепта: id -> (ингредиент, количество)."""
+    return {
+        row.id: (row.ingredient_id, row.amount)
+        for row in RecipeIngredient.objects.filter(recipe=recipe)
+    }
+
+
+def update(recipe, amounts):
+    RecipeCreateSerializer().update_ingredients(
+        recipe,
+        [
+            {'id': ingredient, 'amount': amount}
+            for ingredient, amount in amounts
+        ]
+    )
+
+
+@pytest.mark.django_db
+def test_unchanged_ingredients_keep_their_rows(recipe, ingredients):
+    before = get_rows(recipe)
+    update(recipe, [(ingredient, 1) for ingredient in ingredients[:3]])
+    assert get_rows(recipe) == before
+
+
+@pytest.mark.django_db
+def test_changed_amount_updates_only_its_row(recipe, ingredients):
+    before = get_rows(recipe)
+    update(recipe, [
+        (ingredients[0], 5), (ingredients[1], 1), (ingredients[2], 1)
+    ])
+    after = get_rows(recipe)
+    assert after.keys() == before.keys()
+    assert sorted(after.values()) == [
+        (ingredients[0].id, 5), (ingredients[1].id, 1), (ingredients[2].id, 1)
+    ]
+
+
+@pytest.mark.django_db
+def test_removed_and_added_ingredients(recipe, ingredients):
+    before = get_rows(recipe)
+    update(recipe, [(ingredients[1], 1), (ingredients[3], 2)])
+    after = get_rows(recipe)
+    assert sorted(after.values()) == [
+        (ingredients[1].id, 1), (ingredients[3].id, 2)
+    ]
+    kept = {
+        row_id for row_id, (ingredient_id, _) in before.items()
+        if ingredient_id == ingredients[1].id
+    }
+    assert kept < after.keys()
+
+
+@pytest.mark.django_db
+def test_duplicate_rows_collapse_to_one(recipe, ingredients):
+    RecipeIngredient.objects.create(
+        recipe=recipe, ingredient=ingredients[0], amount=7
+    )
+    update(recipe, [(ingredient, 1) for ingredient in ingredients[:3]])
+    assert sorted(get_rows(recipe).values()) == [
+        (ingredient.id, 1) for ingredient in ingredients[:3]
+    ]
+
+
+@pytest.mark.django_db
+def test_duplicate_ingredients_in_request_are_rejected(
+    recipe, ingredients, user_client
+):
+    before = get_rows(recipe)
+    response = user_client.patch(
+        f'/api/recipes/{recipe.id}/',
+        {
+            'tags': [tag.id for tag in recipe.tags.all()],
+            'ingredients': [
+                {'id': ingredients[0].id, 'amount': 1},
+                {'id': ingredients[0].id, 'amount': 2},
+            ],
+        },
+        format='json'
+    )
+    assert response.status_code == 400
+    assert get_rows(recipe) == before
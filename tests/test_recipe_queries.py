@@ -0,0 +1,73 @@
+import pytest
+from rest_framework.test import APIClient
+
+LIST_URL = '/api/recipes/'
+PAGE_SIZES = (5, 50, 500)
+
+# Страница рецептов загружается фиксированным числом запросов
+# независимо от размера: подсчет, рецепты с авторами, ингредиенты
+# с продуктами и теги; для пользователя флаги избранного и списка
+# покупок входят в запрос рецептов, а подписки загружаются отдельно.
+ANONYMOUS_QUERIES = 4
+AUTHENTICATED_QUERIES = 5
+# Страница из общего кэша: флаги пользователя загружаются
+# тремя запросами — подписки, избранное и список покупок.
+CACHED_AUTHENTICATED_QUERIES = 3
+
+
+@pytest.fixture
+def shared_cache(settings, tmp_path):
+    """Подменяет кэш в памяти процесса общим файловым кэшем."""
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(tmp_path),
+        }
+    }
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('limit', PAGE_SIZES)
+def test_recipe_list_anonymous_query_count(
+    limit, recipes, django_assert_num_queries
+):
+    with django_assert_num_queries(ANONYMOUS_QUERIES):
+        response = APIClient().get(LIST_URL, {'limit': limit})
+    assert response.status_code == 200
+    assert len(response.data['results']) == limit
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('limit', PAGE_SIZES)
+def test_recipe_list_authenticated_query_count(
+    limit, recipes, user_client, django_assert_num_queries
+):
+    with django_assert_num_queries(AUTHENTICATED_QUERIES):
+        response = user_client.get(LIST_URL, {'limit': limit})
+    assert response.status_code == 200
+    results = response.data['results']
+    assert len(results) == limit
+    assert any(recipe['is_favorited'] for recipe in results)
+    assert any(recipe['is_in_shopping_cart'] for recipe in results)
+    assert any(recipe['author']['is_subscribed'] for recipe in results)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('limit', PAGE_SIZES)
+def test_recipe_list_cached_query_count(
+    limit, recipes, shared_cache, user_client, django_assert_num_queries
+):
+    expected = user_client.get(LIST_URL, {'limit': limit}).data
+    with django_assert_num_queries(CACHED_AUTHENTICATED_QUERIES):
+        response = user_client.get(LIST_URL, {'limit': limit})
+    assert response.status_code == 200
+    assert response.data == expected
+
+
+@pytest.mark.django_db
+def test_recipe_list_not_cached_in_process_memory(
+    recipes, django_assert_num_queries
+):
+    APIClient().get(LIST_URL, {'limit': 5})
+    with django_assert_num_queries(ANONYMOUS_QUERIES):
+        APIClient().get(LIST_URL, {'limit': 5})